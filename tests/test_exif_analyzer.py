@@ -0,0 +1,29 @@
+from io import BytesIO
+
+from PIL import Image
+
+from the_big_brother.modules.exif_analyzer import _header_complete, extract_exif
+
+
+def _jpeg_with_exif() -> bytes:
+    exif = Image.Exif()
+    exif[0x0110] = "TestCam"  # Model
+    out = BytesIO()
+    Image.new("RGB", (64, 64), "red").save(out, "JPEG", exif=exif)
+    return out.getvalue()
+
+
+def test_jpeg_cut_inside_sos_header_is_incomplete():
+    jpg = _jpeg_with_exif()
+    sos = jpg.index(b"\xff\xda")
+    assert not _header_complete(jpg[:sos + 4])
+
+
+def test_jpeg_cut_after_sos_header_parses():
+    jpg = _jpeg_with_exif()
+    sos = jpg.index(b"\xff\xda")
+    header = jpg[:sos + 2 + int.from_bytes(jpg[sos + 2:sos + 4], "big")]
+    assert _header_complete(header)
+    results = extract_exif(header, "test.jpg")
+    assert results["error"] is None
+    assert results["basic"]["Model"] == "TestCam"
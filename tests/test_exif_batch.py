@@ -0,0 +1,23 @@
+import io
+import os
+
+from starlette.datastructures import UploadFile
+
+from the_big_brother.gui import main
+
+
+def _upload(name: str, size: int, known_size: bool = True) -> UploadFile:
+    return UploadFile(io.BytesIO(b"x" * size), filename=name, size=size if known_size else None)
+
+
+def test_oversized_upload_skips_only_itself(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "EXIF_BATCH_MAX_BYTES", 100)
+    for known_size in (True, False):
+        workdir = tmp_path / str(known_size)
+        workdir.mkdir()
+        files = [_upload("small1.jpg", 30, known_size), _upload("huge.jpg", 500, known_size),
+                 _upload("small2.jpg", 30, known_size), _upload("small3.jpg", 30, known_size)]
+        spooled = main.spool_exif_uploads(files, str(workdir))
+        assert [name for name, _ in spooled["files"]] == ["small1.jpg", "small2.jpg", "small3.jpg"]
+        assert spooled["skipped"] == ["huge.jpg"]
+        assert len(os.listdir(workdir)) == 3
@@ -0,0 +1,335 @@
+"""Process-wide pool of warm Chromium browsers.
+
+Launching Chromium costs hundreds of milliseconds to seconds and every
+instance carries its own memory, so the validator, the image grabber and the
+reverse image search all borrow browser contexts from this pool instead of
+launching their own.
+
+Playwright objects are bound to the event loop that created them. The pool
+therefore owns a dedicated thread running its own loop; coroutines using
+leased contexts are scheduled on that loop with ``run`` (from async code) or
+``run_sync`` (from threads).
+
+Contexts are leased by kind and options. A returned context is kept warm for
+the next lease of the same kind until it reaches ``context_max_uses`` leases
+or ``context_max_age`` seconds, and is health-checked before every reuse.
+Browsers are retired after ``browser_max_age`` seconds: they stop handing out
+new contexts and close once their last context is gone.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:
+    async_playwright = None
+
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+
+
+class _Browser:
+    def __init__(self, browser, headless: bool):
+        self.browser = browser
+        self.headless = headless
+        self.launched_at = time.monotonic()
+        self.contexts = 0
+        self.retiring = False
+
+    def healthy(self) -> bool:
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+
+class Lease:
+    """A browser context with one open page, lent out by the pool.
+
+    ``data`` is free for the lessee: hooks installed by ``setup`` can keep
+    per-use state there.
+    """
+
+    def __init__(self, key, owner: _Browser, context, page):
+        self.key = key
+        self.owner = owner
+        self.context = context
+        self.page = page
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.data = {}
+        self.broken = False
+
+    def discard(self):
+        """Close this context on release instead of reusing it."""
+        self.broken = True
+
+
+class BrowserPool:
+    def __init__(self, max_contexts: int = 16, headless: bool = True,
+                 context_max_uses: int = 25, context_max_age: float = 300,
+                 browser_max_age: float = 1800):
+        self.max_contexts = max_contexts
+        self.headless = headless
+        self.context_max_uses = context_max_uses
+        self.context_max_age = context_max_age
+        self.browser_max_age = browser_max_age
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browsers: list = []
+        self._idle: "OrderedDict[int, Lease]" = OrderedDict()
+        self._leased = 0
+        self._capacity: Optional[asyncio.Semaphore] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._stats = {
+            "leases": 0, "warm_leases": 0, "wait_seconds": 0.0, "peak_leased": 0,
+            "contexts_created": 0, "contexts_recycled": 0, "browser_launches": 0,
+            "browsers_retired": 0,
+        }
+
+    # -- Scheduling ----------------------------------------------------------
+
+    def submit(self, fn: Callable[..., Awaitable], *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` on the pool loop.
+
+        Returns a concurrent.futures.Future.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), loop)
+
+    async def run(self, fn: Callable[..., Awaitable], *args, **kwargs):
+        """Await ``fn(*args, **kwargs)`` run on the pool loop, from any loop."""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await fn(*args, **kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def run_sync(self, fn: Callable[..., Awaitable], *args, timeout: Optional[float] = None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool loop and wait for it.
+
+        After ``timeout`` seconds the coroutine is cancelled (releasing its
+        contexts) and concurrent.futures.TimeoutError is raised.
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("run_sync() called from the browser pool thread")
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._serve, args=(ready,),
+                                                name="browser-pool", daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _serve(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._capacity = asyncio.Semaphore(self.max_contexts)
+        self._launch_lock = asyncio.Lock()
+        ready.set()
+        loop.run_forever()
+
+    # -- Leasing (pool loop only) -------------------------------------------
+
+    @asynccontextmanager
+    async def lease(self, kind: str, setup: Optional[Callable[[Lease], Awaitable]] = None,
+                    headless: Optional[bool] = None, **options):
+        """Lease a context of ``kind`` created with ``options``.
+
+        ``setup`` runs once on every new context of this kind, e.g. to
+        install routes or event listeners. An exception leaving the block
+        discards the context.
+        """
+        if async_playwright is None:
+            raise RuntimeError("Playwright not installed")
+        headless = self.headless if headless is None else headless
+        key = (kind, headless, json.dumps(options, sort_keys=True, default=str))
+
+        start = time.monotonic()
+        await self._capacity.acquire()
+        self._stats["wait_seconds"] += time.monotonic() - start
+        try:
+            lease = await self._acquire(key, headless, setup, options)
+            self._leased += 1
+            self._stats["leases"] += 1
+            self._stats["peak_leased"] = max(self._stats["peak_leased"], self._leased)
+            try:
+                yield lease
+            except BaseException:
+                lease.broken = True
+                raise
+            finally:
+                self._leased -= 1
+                lease.uses += 1
+                await self._release(lease)
+        finally:
+            self._capacity.release()
+
+    async def _acquire(self, key, headless: bool, setup, options) -> Lease:
+        # Drop warm contexts that expired or whose browser went away.
+        for lease_id, lease in list(self._idle.items()):
+            if not self._reusable(lease):
+                del self._idle[lease_id]
+                await self._close(lease)
+
+        for lease_id, lease in list(self._idle.items()):
+            if lease.key == key:
+                del self._idle[lease_id]
+                self._stats["warm_leases"] += 1
+                return lease
+
+        # Make room for the new context among the warm ones.
+        while self._idle and len(self._idle) + self._leased >= self.max_contexts:
+            _, oldest = self._idle.popitem(last=False)
+            await self._close(oldest)
+
+        owner = await self._browser(headless)
+        context = await owner.browser.new_context(**options)
+        owner.contexts += 1
+        self._stats["contexts_created"] += 1
+        try:
+            lease = Lease(key, owner, context, await context.new_page())
+            if setup is not None:
+                await setup(lease)
+        except BaseException:
+            owner.contexts -= 1
+            await context.close()
+            await self._close_if_done(owner)
+            raise
+        return lease
+
+    async def _release(self, lease: Lease):
+        if lease.broken or not self._reusable(lease):
+            await self._close(lease)
+        else:
+            self._idle[id(lease)] = lease
+
+    def _reusable(self, lease: Lease) -> bool:
+        return (not lease.broken
+                and not lease.owner.retiring
+                and lease.owner.healthy()
+                and lease.uses < self.context_max_uses
+                and time.monotonic() - lease.created_at < self.context_max_age
+                and not lease.page.is_closed())
+
+    async def _close(self, lease: Lease):
+        self._stats["contexts_recycled"] += 1
+        try:
+            await lease.context.close()
+        except Exception:
+            pass
+        lease.owner.contexts -= 1
+        await self._close_if_done(lease.owner)
+
+    async def _browser(self, headless: bool) -> _Browser:
+        async with self._launch_lock:
+            for owner in list(self._browsers):
+                if owner.retiring:
+                    continue
+                if not owner.healthy() or time.monotonic() - owner.launched_at > self.browser_max_age:
+                    owner.retiring = True
+                    self._stats["browsers_retired"] += 1
+                    await self._close_if_done(owner)
+                elif owner.headless == headless:
+                    return owner
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            browser = await self._playwright.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+            owner = _Browser(browser, headless)
+            self._browsers.append(owner)
+            self._stats["browser_launches"] += 1
+            return owner
+
+    async def _close_if_done(self, owner: _Browser):
+        if (owner.retiring or not owner.healthy()) and owner.contexts <= 0 and owner in self._browsers:
+            self._browsers.remove(owner)
+            try:
+                await owner.browser.close()
+            except Exception:
+                pass
+
+    # -- Housekeeping --------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Utilization metrics of the pool."""
+        stats = dict(self._stats)
+        leases = stats["leases"]
+        stats["avg_wait_ms"] = round(stats.pop("wait_seconds") * 1000 / leases, 1) if leases else 0
+        stats.update({
+            "browsers": len(self._browsers),
+            "contexts_leased": self._leased,
+            "contexts_idle": len(self._idle),
+            "max_contexts": self.max_contexts,
+            "utilization": round(self._leased / self.max_contexts, 2) if self.max_contexts else 0,
+        })
+        return stats
+
+    def close(self, timeout: float = 10):
+        """Close every context and browser and stop the pool thread."""
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout)
+        except Exception as e:
+            print(f"Browser pool shutdown error: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop = None
+
+    async def _shutdown(self):
+        while self._idle:
+            _, lease = self._idle.popitem()
+            await self._close(lease)
+        for owner in list(self._browsers):
+            owner.retiring = True
+            try:
+                await owner.browser.close()
+            except Exception:
+                pass
+        self._browsers.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide pool, configured through the environment.
+
+    TBB_BROWSER_CONTEXTS      -- Maximum open contexts (default 16).
+    TBB_BROWSER_CONTEXT_USES  -- Leases before a context is recycled (default 25).
+    TBB_BROWSER_CONTEXT_AGE   -- Seconds before a context is recycled (default 300).
+    TBB_BROWSER_MAX_AGE       -- Seconds before a browser is retired (default 1800).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                max_contexts=int(os.environ.get("TBB_BROWSER_CONTEXTS", 16)),
+                context_max_uses=int(os.environ.get("TBB_BROWSER_CONTEXT_USES", 25)),
+                context_max_age=float(os.environ.get("TBB_BROWSER_CONTEXT_AGE", 300)),
+                browser_max_age=float(os.environ.get("TBB_BROWSER_MAX_AGE", 1800)),
+            )
+        return _pool
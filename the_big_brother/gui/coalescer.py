@@ -0,0 +1,167 @@
+"""Single-flight coalescing of site probes across GUI jobs.
+
+When two jobs scan the same username at the same time, the first one to
+claim a (site, username, definition hash) key probes it and every job that
+claimed the same key meanwhile receives the same QueryResult. A job that is
+stopped only detaches itself: a probe keeps running while other jobs still
+wait for it.
+"""
+import hashlib
+import json
+import threading
+from typing import Callable, Optional
+
+from the_big_brother.notify import QueryNotify
+from the_big_brother.result import QueryResult, QueryStatus
+from the_big_brother.scanner import scan
+
+
+def definition_hash(info: dict) -> str:
+    """Hash a site definition so edited manifests never share probes."""
+    definition = {k: v for k, v in info.items() if k != "request_future"}
+    return hashlib.sha1(json.dumps(definition, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _Flight:
+    def __init__(self, owner: str, username: str, site_name: str):
+        self.owner = owner
+        self.username = username
+        self.site_name = site_name
+        self.subscribers: dict = {}
+
+
+class _PublishingNotify(QueryNotify):
+    """Notifier given to scan() by the job that owns the probes."""
+
+    def __init__(self, coalescer: "ProbeCoalescer", job_id: str, keys: dict,
+                 cancelled: Callable[[], bool]):
+        self.coalescer = coalescer
+        self.job_id = job_id
+        self.keys = keys
+        self.cancelled = cancelled
+        super().__init__()
+
+    def update(self, result):
+        self.coalescer.publish(self.keys[result.site_name], result)
+        # Keep probing for the others unless nobody needs the results anymore.
+        if self.cancelled() and not self.coalescer.is_shared(self.job_id):
+            raise InterruptedError("Stopped by user")
+
+
+class ProbeCoalescer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict = {}
+
+    def scan(self, job_id: str, username: str, site_data: dict, query_notify: QueryNotify,
+             cancelled: Callable[[], bool], hashes: Optional[dict] = None, **scan_kwargs):
+        """Scan ``username`` over ``site_data``, sharing in-flight probes.
+
+        Every site's result reaches ``query_notify.update`` exactly once,
+        whether this job probed it or attached to another job's probe.
+        Raises InterruptedError once ``cancelled`` returns True.
+
+        Keyword Arguments:
+        job_id                 -- Identifier of the calling job.
+        username               -- Username to look up.
+        site_data              -- Site definitions, as passed to scan().
+        query_notify           -- Notifier receiving this job's results.
+        cancelled              -- Callable telling whether the job was stopped.
+        hashes                 -- Optional precomputed definition hashes by site.
+        scan_kwargs            -- Extra keyword arguments for scan().
+        """
+        keys = {}
+        for site_name, info in site_data.items():
+            digest = hashes.get(site_name) if hashes else None
+            keys[site_name] = (site_name, username, digest or definition_hash(info))
+
+        delivered = threading.Condition()
+        remaining = set(keys.values())
+        detached = []
+        failures = []
+
+        def deliver(key, result):
+            try:
+                if not detached:
+                    query_notify.update(result)
+            except InterruptedError:
+                detached.append(True)
+            except Exception as e:
+                # Only this job fails: the other subscribers still get the result
+                print(f"Job {job_id} failed to take the result of {key[0]}: {e}")
+                failures.append(e)
+                detached.append(True)
+            with delivered:
+                remaining.discard(key)
+                delivered.notify_all()
+
+        owned = []
+        with self._lock:
+            for site_name, key in keys.items():
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight(job_id, username, site_name)
+                    owned.append(site_name)
+                flight.subscribers[job_id] = deliver
+
+        try:
+            if owned:
+                owned_keys = {site_name: keys[site_name] for site_name in owned}
+                publisher = _PublishingNotify(self, job_id, owned_keys,
+                                              lambda: cancelled() or bool(detached))
+                try:
+                    scan(username, {site_name: site_data[site_name] for site_name in owned},
+                         publisher, **scan_kwargs)
+                except InterruptedError:
+                    pass
+
+            # Wait for the probes other jobs are running on our behalf.
+            with delivered:
+                while remaining and not detached and not cancelled():
+                    delivered.wait(timeout=0.5)
+        finally:
+            self._detach(job_id)
+            self._abandon(job_id)
+
+        if failures:
+            raise failures[0]
+        if detached or cancelled():
+            raise InterruptedError("Stopped by user")
+
+    def publish(self, key, result: QueryResult):
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is None:
+            return
+        for job_id, deliver in list(flight.subscribers.items()):
+            deliver(key, result)
+
+    def is_shared(self, job_id: str) -> bool:
+        """Tell whether other jobs are waiting on probes owned by ``job_id``."""
+        with self._lock:
+            return any(
+                flight.owner == job_id and any(sub != job_id for sub in flight.subscribers)
+                for flight in self._flights.values()
+            )
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def _detach(self, job_id: str):
+        with self._lock:
+            for flight in self._flights.values():
+                flight.subscribers.pop(job_id, None)
+
+    def _abandon(self, job_id: str):
+        # Probes the owner never finished (error or stop): release whoever
+        # attached to them in the meantime instead of leaving them waiting.
+        with self._lock:
+            abandoned = [(key, flight) for key, flight in self._flights.items() if flight.owner == job_id]
+            for key, _ in abandoned:
+                del self._flights[key]
+        for key, flight in abandoned:
+            result = QueryResult(flight.username, flight.site_name, "", QueryStatus.UNKNOWN,
+                                 context="Shared probe aborted")
+            for deliver in list(flight.subscribers.values()):
+                deliver(key, result)
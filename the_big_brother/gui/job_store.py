@@ -0,0 +1,352 @@
+"""Job storage for the GUI backend.
+
+Jobs used to live in a plain module-level dict for the lifetime of the
+process. The stores below bound that growth with TTL/LRU eviction, and the
+SQLite backend lets several uvicorn workers share job state through one file.
+They also keep validation verdicts by profile URL, so re-scans of the same
+username don't load the same pages again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class JobState:
+    """State of one GUI scan job.
+
+    Every change to the results or images bumps ``seq``. Each result records
+    the ``rev`` at which it last changed, so clients holding a cursor only
+    need the entries with a newer rev. ``saved_seq`` is the same kind of
+    cursor for the SQLite store, which only writes the results changed since.
+    """
+
+    def __init__(self):
+        self.status = "queued"
+        self.queue_position = 0
+        self.results = []
+        self.images = []
+        self.images_rev = 0
+        self.seq = 0
+        self.saved_seq = 0
+        self.stop_requested = False
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def add_result(self, entry: dict) -> dict:
+        with self._lock:
+            self.seq += 1
+            entry["id"] = len(self.results)
+            entry["rev"] = self.seq
+            self.results.append(entry)
+        return entry
+
+    def update_result(self, entry: dict, **fields):
+        with self._lock:
+            self.seq += 1
+            entry.update(fields)
+            entry["rev"] = self.seq
+
+    def set_images(self, images: list):
+        with self._lock:
+            self.seq += 1
+            self.images = images
+            self.images_rev = self.seq
+
+    def delta(self, since: int) -> dict:
+        """Everything that changed after cursor ``since``."""
+        with self._lock:
+            data = {
+                "status": self.status,
+                "queue_position": self.queue_position,
+                "cursor": self.seq,
+                "results": [dict(r) for r in self.results if r.get("rev", 0) > since],
+            }
+            if self.images_rev > since:
+                data["images"] = list(self.images)
+        return data
+
+    def to_dict(self) -> dict:
+        # Copy the containers: other threads keep appending to / updating
+        # them while the snapshot is being serialized.
+        with self._lock:
+            return {
+                "status": self.status,
+                "queue_position": self.queue_position,
+                "seq": self.seq,
+                "images_rev": self.images_rev,
+                "results": [dict(r) for r in self.results],
+                "images": list(self.images),
+            }
+
+    def changes(self, since: int) -> tuple:
+        """The job without its results, and the results changed after ``since``."""
+        with self._lock:
+            state = {
+                "status": self.status,
+                "queue_position": self.queue_position,
+                "seq": self.seq,
+                "images_rev": self.images_rev,
+                "images": list(self.images),
+            }
+            changed = [dict(r) for r in self.results if r.get("rev", 0) > since]
+        return state, changed
+
+    @classmethod
+    def from_dict(cls, data: dict, stop_requested: bool = False, updated_at: Optional[float] = None):
+        job = cls()
+        job.status = data.get("status", "queued")
+        job.queue_position = data.get("queue_position", 0)
+        job.seq = data.get("seq", 0)
+        job.saved_seq = job.seq
+        job.images_rev = data.get("images_rev", 0)
+        job.results = data.get("results", [])
+        job.images = data.get("images", [])
+        job.stop_requested = stop_requested
+        if updated_at is not None:
+            job.updated_at = updated_at
+        return job
+
+
+class MemoryJobStore:
+    """In-process job store with TTL and LRU eviction."""
+
+    def __init__(self, ttl: float = 3600, max_jobs: int = 500,
+                 verdict_ttl: float = 86400, max_verdicts: int = 20000):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.verdict_ttl = verdict_ttl
+        self.max_verdicts = max_verdicts
+        self._jobs: "OrderedDict[str, JobState]" = OrderedDict()
+        self._verdicts: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str) -> JobState:
+        job = JobState()
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[JobState]:
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs.move_to_end(job_id)
+            return job
+
+    def save(self, job_id: str, job: JobState):
+        # The running job mutates the stored object directly, so there is
+        # nothing to write: just refresh its position for TTL/LRU purposes.
+        job.updated_at = time.time()
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs.move_to_end(job_id)
+
+    def request_stop(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.stop_requested = True
+        return True
+
+    def stop_requested(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        return job is None or job.stop_requested
+
+    def get_verdict(self, url: str) -> Optional[dict]:
+        with self._lock:
+            cached = self._verdicts.get(url)
+            if cached is None:
+                return None
+            stored_at, verdict = cached
+            if stored_at < time.time() - self.verdict_ttl:
+                del self._verdicts[url]
+                return None
+            self._verdicts.move_to_end(url)
+            return dict(verdict)
+
+    def put_verdict(self, url: str, verdict: dict):
+        with self._lock:
+            self._verdicts[url] = (time.time(), dict(verdict))
+            self._verdicts.move_to_end(url)
+            while len(self._verdicts) > self.max_verdicts:
+                self._verdicts.popitem(last=False)
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self._jobs.items() if job.updated_at < cutoff]:
+            del self._jobs[job_id]
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+
+class SQLiteJobStore:
+    """Job store backed by a SQLite file, shared by every worker process.
+
+    The stop flag has its own column so that ``save`` from the worker running
+    a job never overwrites a stop requested through another worker. Results
+    are rows of their own, so a save only writes the ones that changed
+    instead of the whole job.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, max_jobs: int = 500,
+                 verdict_ttl: float = 86400, max_verdicts: int = 20000):
+        self.path = path
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.verdict_ttl = verdict_ttl
+        self.max_verdicts = max_verdicts
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " stop_requested INTEGER NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_accessed ON jobs (accessed_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            " job_id TEXT NOT NULL,"
+            " result_id INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, result_id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " url TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_stored ON verdicts (stored_at)")
+
+    def create(self, job_id: str) -> JobState:
+        job = JobState()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, stop_requested, updated_at, accessed_at) VALUES (?, ?, 0, ?, ?)",
+                (job_id, json.dumps(job.to_dict()), now, now),
+            )
+            self._conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[JobState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, stop_requested, updated_at FROM jobs WHERE job_id = ? AND updated_at >= ?",
+                (job_id, time.time() - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET accessed_at = ? WHERE job_id = ?", (time.time(), job_id))
+            results = self._conn.execute(
+                "SELECT data FROM job_results WHERE job_id = ? ORDER BY result_id", (job_id,)
+            ).fetchall()
+        data, stop_requested, updated_at = row
+        data = json.loads(data)
+        if results:
+            data["results"] = [json.loads(r[0]) for r in results]
+        return JobState.from_dict(data, bool(stop_requested), updated_at)
+
+    def save(self, job_id: str, job: JobState):
+        job.updated_at = time.time()
+        # Under the lock, so two threads saving the same job can't write an
+        # older copy of a result over a newer one.
+        with self._lock:
+            state, changed = job.changes(job.saved_seq)
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET data = ?, updated_at = ?, accessed_at = ? WHERE job_id = ?",
+                    (json.dumps(state), job.updated_at, job.updated_at, job_id),
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO job_results (job_id, result_id, data) VALUES (?, ?, ?)",
+                    [(job_id, r["id"], json.dumps(r)) for r in changed],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            job.saved_seq = state["seq"]
+
+    def request_stop(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET stop_requested = 1 WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def stop_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT stop_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def get_verdict(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM verdicts WHERE url = ? AND stored_at >= ?",
+                (url, time.time() - self.verdict_ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_verdict(self, url: str, verdict: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (url, data, stored_at) VALUES (?, ?, ?)",
+                (url, json.dumps(verdict), time.time()),
+            )
+            self._conn.execute("DELETE FROM verdicts WHERE stored_at < ?", (time.time() - self.verdict_ttl,))
+            self._conn.execute(
+                "DELETE FROM verdicts WHERE url IN ("
+                " SELECT url FROM verdicts ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_verdicts,),
+            )
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM jobs WHERE job_id IN ("
+            " SELECT job_id FROM jobs ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_jobs,),
+        )
+        self._conn.execute("DELETE FROM job_results WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+
+
+def create_job_store():
+    """Build the job store configured through the environment.
+
+    TBB_JOB_DB      -- Path of a SQLite file. When set, jobs are persisted there
+                       and shared between worker processes.
+    TBB_JOB_TTL     -- Seconds a job is kept after its last update (default 3600).
+    TBB_MAX_JOBS    -- Maximum number of jobs kept (default 500).
+    TBB_VERDICT_TTL -- Seconds a validation verdict is reused (default 86400).
+    TBB_MAX_VERDICTS -- Maximum number of verdicts kept (default 20000).
+    """
+    limits = {
+        "ttl": float(os.environ.get("TBB_JOB_TTL", 3600)),
+        "max_jobs": int(os.environ.get("TBB_MAX_JOBS", 500)),
+        "verdict_ttl": float(os.environ.get("TBB_VERDICT_TTL", 86400)),
+        "max_verdicts": int(os.environ.get("TBB_MAX_VERDICTS", 20000)),
+    }
+    db_path = os.environ.get("TBB_JOB_DB")
+    if db_path:
+        return SQLiteJobStore(db_path, **limits)
+    return MemoryJobStore(**limits)
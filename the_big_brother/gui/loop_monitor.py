@@ -0,0 +1,163 @@
+"""Event-loop lag monitor for the GUI server.
+
+A heartbeat coroutine sleeps for ``interval`` and measures how late it wakes
+up: that delay is the time the loop spent running something else without
+yielding. A watchdog thread notices a heartbeat that is overdue by more than
+``threshold`` while the stall is still happening, and records which request
+(or task) the loop is running and where in the code it is stuck. Every stall
+is logged and kept for the /api/debug/loop-lag report.
+
+Requests are labelled by LoopLagMiddleware. Enable the monitor with
+TBB_LOOP_MONITOR=1 (threshold in ms: TBB_LOOP_LAG_MS, default 100).
+"""
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+_ID_SEGMENT = re.compile(r"/[0-9a-fA-F-]{16,}(?=/|$)")
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, samples: int = 6000, stalls: int = 200):
+        self.interval = interval
+        self.threshold = threshold
+        self.task_labels: dict = {}
+        self._lags = deque(maxlen=samples)
+        self._stalls = deque(maxlen=stalls)
+        self._offenders: dict = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._beat = 0.0
+        self._suspect = None
+        self._running = False
+        self._heartbeat_task = None
+
+    def start(self):
+        """Start monitoring the running loop (call from that loop)."""
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._running = True
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-monitor", daemon=True).start()
+        print(f"[*] Loop lag monitor active (threshold {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._running = False
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+
+    def label(self, task, name: str):
+        self.task_labels[task] = name
+
+    def unlabel(self, task):
+        self.task_labels.pop(task, None)
+
+    async def _heartbeat(self):
+        while self._running:
+            start = time.monotonic()
+            self._beat = start
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - start - self.interval, 0.0)
+            self._lags.append(lag)
+            if lag >= self.threshold:
+                self._record(lag)
+
+    def _watchdog(self):
+        while self._running:
+            time.sleep(self.interval / 2)
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue >= self.threshold and self._suspect is None:
+                # The loop is stuck right now: see what it is running
+                self._suspect = self._snapshot()
+
+    def _snapshot(self) -> tuple:
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+        label = self.task_labels.get(task) if task is not None else None
+        if label is None:
+            label = task.get_name() if task is not None else "loop callback"
+
+        where = "unknown"
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is not None:
+            stack = traceback.extract_stack(frame)
+            # Innermost frame of our own code, else the innermost frame
+            ours = [f for f in stack if "the_big_brother" in f.filename and f.filename != __file__]
+            top = (ours or stack)[-1]
+            where = f"{os.path.basename(top.filename)}:{top.lineno} in {top.name}"
+        return label, where
+
+    def _record(self, lag: float):
+        label, where = self._suspect or ("unknown", "unknown")
+        self._suspect = None
+        lag_ms = round(lag * 1000, 1)
+        self._stalls.append({"at": time.time(), "lag_ms": lag_ms, "label": label, "where": where})
+
+        offender = self._offenders.setdefault(label, {"label": label, "stalls": 0, "total_ms": 0.0,
+                                                      "max_ms": 0.0, "where": where})
+        offender["stalls"] += 1
+        offender["total_ms"] = round(offender["total_ms"] + lag_ms, 1)
+        if lag_ms >= offender["max_ms"]:
+            offender["max_ms"] = lag_ms
+            offender["where"] = where
+        print(f"[!] Event loop blocked for {lag_ms} ms by {label} ({where})")
+
+    def report(self, top: int = 10) -> dict:
+        lags = sorted(self._lags)
+
+        def percentile(p):
+            if not lags:
+                return 0.0
+            return round(lags[min(int(len(lags) * p), len(lags) - 1)] * 1000, 1)
+
+        return {
+            "enabled": True,
+            "threshold_ms": self.threshold * 1000,
+            "samples": len(lags),
+            "lag_ms": {"p50": percentile(0.5), "p90": percentile(0.9), "p99": percentile(0.99),
+                       "max": round(lags[-1] * 1000, 1) if lags else 0.0},
+            "worst_offenders": sorted(self._offenders.values(), key=lambda o: o["total_ms"], reverse=True)[:top],
+            "recent_stalls": list(self._stalls)[-top:],
+        }
+
+
+class LoopLagMiddleware:
+    """Pure ASGI middleware naming the task that serves each request."""
+
+    def __init__(self, app, monitor: LoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        # Collapse job ids so one endpoint is reported as one offender
+        self.monitor.label(task, f"{scope['method']} {_ID_SEGMENT.sub('/{id}', scope['path'])}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.unlabel(task)
+
+
+def create_loop_monitor() -> Optional[LoopMonitor]:
+    """LoopMonitor configured through the environment, or None when disabled.
+
+    TBB_LOOP_MONITOR   -- Set to 1 to enable the monitor.
+    TBB_LOOP_LAG_MS    -- Stalls longer than this are recorded (default 100).
+    """
+    if os.environ.get("TBB_LOOP_MONITOR", "").lower() not in ("1", "true", "yes"):
+        return None
+    return LoopMonitor(threshold=float(os.environ.get("TBB_LOOP_LAG_MS", 100)) / 1000)
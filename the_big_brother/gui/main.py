@@ -1,4 +1,6 @@
-from fastapi import FastAPI, BackgroundTasks, Response, UploadFile, File, Form
+from fastapi import FastAPI, BackgroundTasks, Request, Response, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -7,24 +9,42 @@ import os
 import sys
 import io
 import csv
+import json
+import time
+import asyncio
+import threading
+import shutil
+import tempfile
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import List, Optional
 
 # Add parent directory to path to allow imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from the_big_brother.scanner import scan, SitesInformation, QueryNotify, QueryStatus
+from the_big_brother.scanner import QueryNotify, QueryStatus
 from the_big_brother.image_grabber import fetch_images
 from the_big_brother.reverse_search import ReverseImageSearcher
-from the_big_brother.validators.headless_validator import HeadlessValidator
+from the_big_brother.browser_pool import get_browser_pool
+from the_big_brother.image_index import ImageIndex
 from the_big_brother.modules.digital_footprint import get_phone_info, run_holehe
-from the_big_brother.modules.network_mapper import scan_target, generate_network_map
-from the_big_brother.modules.dark_watch import search_dark_web
+from the_big_brother.modules.network_mapper import scan_target, build_graph, generate_network_map
+from the_big_brother.modules.dark_watch import search_dark_web, refresh_leak_feed
 from the_big_brother.modules.crypto_analyzer import analyze_crypto
 from the_big_brother.modules.ssl_sentinel import get_ssl_info
-from the_big_brother.modules.exif_analyzer import get_exif_data
+from the_big_brother.modules.exif_analyzer import get_exif_data, extract_exif
 from the_big_brother.modules.dork_studio import generate_dorks
 from the_big_brother.modules.geoint_spy import get_geoint_data
 from the_big_brother.modules.flight_radar import get_flight_radar
+from the_big_brother.modules.http_client import aclose_client
+from the_big_brother.modules.cache import get_response_cache
+from the_big_brother.gui.job_store import JobState, create_job_store
+from the_big_brother.gui.scheduler import create_scan_scheduler
+from the_big_brother.gui.coalescer import ProbeCoalescer
+from the_big_brother.gui.manifest import ManifestCache
+from the_big_brother.gui.validation import ValidationPipeline
+from the_big_brother.gui.loop_monitor import LoopLagMiddleware, create_loop_monitor
 
 class FootprintRequest(BaseModel):
     query: str
@@ -71,45 +91,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage
-class JobState:
-    def __init__(self):
-        self.status = "running"
-        self.results = []
-        self.images = []
-        self.stop_requested = False
+# Optional event-loop lag monitor (TBB_LOOP_MONITOR=1)
+loop_monitor = create_loop_monitor()
+if loop_monitor:
+    app.add_middleware(LoopLagMiddleware, monitor=loop_monitor)
+
+# Job storage (in-memory by default, SQLite when TBB_JOB_DB is set)
+jobs = create_job_store()
+
+FINISHED_STATUSES = ("completed", "stopped", "error")
+STREAM_INTERVAL = 0.5
+
+# Shared HTTP workers and connection pool for every scan in this process
+scheduler = create_scan_scheduler()
+
+# Identical probes from concurrent jobs share one request
+coalescer = ProbeCoalescer()
+
+# Image search runs beside the scan, bounded by its own timeout
+IMAGE_FETCH_TIMEOUT = float(os.environ.get("TBB_IMAGE_TIMEOUT", 30))
+image_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="images")
+
+# EXIF batches: images are spooled to disk and parsed in worker processes
+EXIF_BATCH_MAX_FILES = int(os.environ.get("TBB_EXIF_BATCH_FILES", 500))
+EXIF_BATCH_MAX_BYTES = int(os.environ.get("TBB_EXIF_BATCH_BYTES", 1024 * 1024 * 1024))
+_exif_pool = None
+_exif_pool_lock = threading.Lock()
+
+def get_exif_pool() -> ProcessPoolExecutor:
+    global _exif_pool
+    with _exif_pool_lock:
+        if _exif_pool is None:
+            # spawn: forking a process running threads (browser pool, scans) is unsafe
+            _exif_pool = ProcessPoolExecutor(
+                max_workers=int(os.environ.get("TBB_EXIF_WORKERS", min(4, os.cpu_count() or 1))),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _exif_pool
+
+def spool_exif_uploads(files, workdir: str) -> dict:
+    """Copy uploaded images, and the images inside uploaded zip archives, to
+    ``workdir``. Returns ``(name, path)`` pairs and the skipped entries."""
+    spooled = {"files": [], "skipped": []}
+    budget = EXIF_BATCH_MAX_BYTES
+
+    def add(name, source, size=None):
+        nonlocal budget
+        if len(spooled["files"]) >= EXIF_BATCH_MAX_FILES or (size is not None and size > budget):
+            spooled["skipped"].append(name)
+            return
+        path = os.path.join(workdir, str(len(spooled["files"])))
+        with open(path, "wb") as out:
+            copied = _copy_limited(source, out, budget)
+        if copied > budget:
+            # Only this file is skipped: the rest of the budget stays for smaller ones
+            os.remove(path)
+            spooled["skipped"].append(name)
+            return
+        budget -= copied
+        spooled["files"].append((name, path))
+
+    for upload in files:
+        name = upload.filename or "upload"
+        if zipfile.is_zipfile(upload.file):
+            upload.file.seek(0)
+            with zipfile.ZipFile(upload.file) as archive:
+                for member in archive.infolist():
+                    if member.is_dir():
+                        continue
+                    with archive.open(member) as source:
+                        add(f"{name}/{member.filename}", source, member.file_size)
+        else:
+            upload.file.seek(0)
+            add(name, upload.file, getattr(upload, "size", None))
+    return spooled
+
+def _copy_limited(source, out, limit: int) -> int:
+    """Copy at most ``limit`` + 1 bytes; returns the bytes copied."""
+    copied = 0
+    while copied <= limit:
+        chunk = source.read(min(1024 * 1024, limit + 1 - copied))
+        if not chunk:
+            break
+        out.write(chunk)
+        copied += len(chunk)
+    return copied
+
+# Recent deep searches, matched by perceptual hash of the searched image
+deep_search_index = ImageIndex(
+    ttl=float(os.environ.get("TBB_DEEP_SEARCH_TTL", 21600)),
+    max_distance=int(os.environ.get("TBB_DEEP_SEARCH_DISTANCE", 6)),
+)
 
-jobs: dict[str, JobState] = {}
+# Site manifest, loaded once and reloaded when data.json changes.
+# Use local data.json file to ensure all sites are loaded
+manifest = ManifestCache(os.path.join(os.path.dirname(__file__), "..", "resources", "data.json"))
 
 class ScanRequest(BaseModel):
     username: str
+    refresh: bool = False
 
 class NotifyQueue(QueryNotify):
-    def __init__(self, job_id, jobs_dict):
+    def __init__(self, job_id, job, store, pipeline=None):
         self.job_id = job_id
-        self.jobs = jobs_dict
+        self.job = job
+        self.store = store
+        self.pipeline = pipeline
         super().__init__()
 
     def update(self, result):
-        if self.jobs[self.job_id].stop_requested:
+        if self.store.stop_requested(self.job_id):
             raise InterruptedError("Stopped by user")
 
         if result.status == QueryStatus.CLAIMED:
-            self.jobs[self.job_id].results.append({
+            entry = self.job.add_result({
                 "site": result.site_name,
                 "url": result.site_url_user,
                 "status": "Found",
                 "validation": "Pending",
                 "context": result.context
             })
+            self.store.save(self.job_id, self.job)
+            # Validate right away while the remaining probes keep running
+            if self.pipeline is not None:
+                self.pipeline.submit(entry, result)
         elif result.status == QueryStatus.WAF:
-             self.jobs[self.job_id].results.append({
+             self.job.add_result({
                 "site": result.site_name,
                 "url": result.site_url_user,
                 "status": "WAF Blocked",
                 "validation": "Pending",
                 "context": result.context
             })
+             self.store.save(self.job_id, self.job)
 
     def start(self, message=None):
         pass
@@ -117,118 +231,187 @@ class NotifyQueue(QueryNotify):
     def finish(self, message=None):
         pass
 
-def run_scan_job(job_id: str, username: str):
+def run_scan_job(job_id: str, username: str, refresh: bool = False):
+    job = jobs.get(job_id)
+    if job is None:
+        return
+
+    def report_position(position):
+        job.queue_position = position
+        jobs.save(job_id, job)
+
+    try:
+        with scheduler.admit(job_id, on_position=report_position, cancelled=lambda: jobs.stop_requested(job_id)):
+            job.status = "running"
+            job.queue_position = 0
+            jobs.save(job_id, job)
+            run_admitted_job(job_id, job, username, refresh)
+    except InterruptedError:
+        job.status = "stopped"
+        job.queue_position = 0
+        jobs.save(job_id, job)
+
+def fetch_job_images(job_id: str, job: JobState, username: str, abandoned: threading.Event, deadline: float):
+    remaining = deadline - time.monotonic()
+    if abandoned.is_set() or remaining <= 0:
+        return  # Waited in the executor queue past the job's image timeout
+    try:
+        images = fetch_images(username, limit=3, timeout=remaining)
+    except Exception as e:
+        print(f"Image fetch error: {e}")
+        return
+    if abandoned.is_set():
+        print(f"[*] Ignoring images that arrived after job {job_id} ended")
+        return
+    job.set_images(images)
+    jobs.save(job_id, job)
+
+def run_admitted_job(job_id: str, job: JobState, username: str, refresh: bool = False):
     try:
         # Handle spaces: Check "John Doe" and "JohnDoe" (or replace space with nothing)
         usernames_to_check = [username]
         if " " in username:
             usernames_to_check.append(username.replace(" ", ""))
 
-        # 1. Fetch Images (only for the primary username)
-        try:
-            images = fetch_images(username, limit=3)
-            jobs[job_id].images = images
-        except Exception as e:
-            print(f"Image fetch error: {e}")
+        # 1. Fetch Images (only for the primary username) while the scan runs
+        images_abandoned = threading.Event()
+        images_started = time.monotonic()
+        images_future = image_executor.submit(fetch_job_images, job_id, job, username, images_abandoned,
+                                              images_started + IMAGE_FETCH_TIMEOUT)
 
         # 2. Run Scan
-        # Use local data.json file to ensure all sites are loaded
-        # Get the path to the local data.json file
-        data_file_path = os.path.join(os.path.dirname(__file__), "..", "resources", "data.json")
-        sites_info = SitesInformation(data_file_path=data_file_path, honor_exclusions=False)
-        site_data = {site.name: site.information for site in sites_info}
+        manifest_snapshot = manifest.get()
+        site_data = manifest_snapshot.site_data_copy()
         
-        notify = NotifyQueue(job_id, jobs)
+        pipeline = ValidationPipeline(job_id, job, jobs, refresh=refresh)
+        notify = NotifyQueue(job_id, job, jobs, pipeline)
+        session = scheduler.session(job_id)
         
+        pipeline.start()
         try:
             for u in usernames_to_check:
-                if jobs[job_id].stop_requested: break
-                scan(u, site_data, notify)
+                if jobs.stop_requested(job_id): break
+                coalescer.scan(job_id, u, site_data, notify,
+                               cancelled=lambda: jobs.stop_requested(job_id),
+                               hashes=manifest_snapshot.hashes, session=session)
         except InterruptedError:
-            jobs[job_id].status = "stopped"
-            return
-
-        if jobs[job_id].stop_requested:
-             jobs[job_id].status = "stopped"
-             return
-
-        # 3. Validate
-        jobs[job_id].status = "validating"
-        validate_results(job_id)
+            pass
+        finally:
+            scheduler.close_lane(job_id)
+
+            # 3. Finish validating the hits still queued
+            if not jobs.stop_requested(job_id):
+                job.status = "validating"
+                jobs.save(job_id, job)
+            pipeline.finish()
+
+            # 4. Give the images what is left of their timeout
+            if not jobs.stop_requested(job_id):
+                remaining = IMAGE_FETCH_TIMEOUT - (time.monotonic() - images_started)
+                try:
+                    images_future.result(timeout=max(remaining, 0))
+                except FutureTimeout:
+                    print(f"Image fetch timed out for job {job_id}")
+            images_abandoned.set()
+            # Not started yet: drop it; running: its browser work stops at the deadline
+            images_future.cancel()
         
-        if jobs[job_id].stop_requested:
-            jobs[job_id].status = "stopped"
+        if jobs.stop_requested(job_id):
+            job.status = "stopped"
         else:
-            jobs[job_id].status = "completed"
+            job.status = "completed"
+        jobs.save(job_id, job)
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"Error in scan job: {e}")
-        jobs[job_id].status = "error"
-
-def validate_results(job_id: str):
-    results = jobs[job_id].results
-    if not results:
-        return
-
-    to_validate = [r for r in results if r["status"] == "Found"]
-    
-    if not to_validate:
-        return
-
-    try:
-        with HeadlessValidator(headless=True) as validator:
-            for res in to_validate:
-                if jobs[job_id].stop_requested:
-                    break
-                
-                res["validation"] = "Checking..."
-                val_res = validator.validate(res["url"])
-                
-                if val_res.is_profile:
-                    res["validation"] = "Verified"
-                    res["page_title"] = val_res.title
-                    res["snippet"] = val_res.visible_text[:200] if val_res.visible_text else ""
-                else:
-                    res["validation"] = "False Positive"
-                    res["reason"] = val_res.reason
-    except Exception as e:
-        print(f"Validation error: {e}")
+        job.status = "error"
+        jobs.save(job_id, job)
 
 @app.post("/api/scan")
 async def start_scan(request: ScanRequest, background_tasks: BackgroundTasks):
     job_id = str(uuid4())
-    jobs[job_id] = JobState()
-    background_tasks.add_task(run_scan_job, job_id, request.username)
+    await run_in_threadpool(jobs.create, job_id)
+    background_tasks.add_task(run_scan_job, job_id, request.username, request.refresh)
     return {"job_id": job_id}
 
 @app.post("/api/stop/{job_id}")
 async def stop_scan(job_id: str):
-    if job_id in jobs:
-        jobs[job_id].stop_requested = True
+    if await run_in_threadpool(jobs.request_stop, job_id):
         return {"status": "stopping"}
     return {"error": "Job not found"}
 
 @app.get("/api/results/{job_id}")
-async def get_results(job_id: str):
-    if job_id not in jobs:
+async def get_results(job_id: str, since: Optional[int] = None):
+    job = await run_in_threadpool(jobs.get, job_id)
+    if job is None:
         return {"error": "Job not found"}
+    if since is not None:
+        # Incremental poll: only what changed after the client's cursor
+        return job.delta(since)
+    # A copy: validation threads keep updating the results while they are encoded
+    snapshot = job.to_dict()
     return {
-        "status": jobs[job_id].status,
-        "results": jobs[job_id].results,
-        "images": jobs[job_id].images
+        "status": snapshot["status"],
+        "queue_position": snapshot["queue_position"],
+        "cursor": snapshot["seq"],
+        "results": snapshot["results"],
+        "images": snapshot["images"]
     }
 
+@app.get("/api/results/{job_id}/stream")
+async def stream_results(job_id: str, request: Request, since: int = 0):
+    """Server-Sent Events feed of result, validation and image deltas."""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def events():
+        cursor = since
+        last_state = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            job = await run_in_threadpool(jobs.get, job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+
+            # One snapshot decides both what is sent and whether the job is done,
+            # so the final status always goes out before the stream ends
+            delta = job.delta(cursor)
+            state = (delta["cursor"], delta["status"], delta["queue_position"])
+            if state != last_state:
+                cursor = delta["cursor"]
+                last_state = state
+                idle = 0.0
+                yield f"id: {cursor}\nevent: update\ndata: {json.dumps(delta)}\n\n"
+            elif idle >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                idle = 0.0
+                yield ": keep-alive\n\n"
+
+            if state[1] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(STREAM_INTERVAL)
+            idle += STREAM_INTERVAL
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/download/{job_id}")
 async def download_report(job_id: str):
-    if job_id not in jobs:
+    job = await run_in_threadpool(jobs.get, job_id)
+    if job is None:
         return {"error": "Job not found"}
     
-    results = jobs[job_id].results
+    results = job.to_dict()["results"]  # A copy, see get_results
     output = io.StringIO()
     writer = csv.writer(output)
-    writer.writerow(["Site", "URL", "Status", "Validation", "Page Title"])
+    writer.writerow(["Site", "URL", "Status", "Validation", "Validation Tier", "Page Title"])
     
     for r in results:
         writer.writerow([
@@ -236,6 +419,7 @@ async def download_report(job_id: str):
             r.get("url"), 
             r.get("status"), 
             r.get("validation"), 
+            r.get("validation_tier", ""),
             r.get("page_title", "")
         ])
     
@@ -245,27 +429,107 @@ async def download_report(job_id: str):
         headers={"Content-Disposition": f"attachment; filename=report_{job_id}.csv"}
     )
 
+@app.get("/api/deep-search/index")
+async def deep_search_index_stats():
+    return deep_search_index.stats()
+
+@app.get("/api/browser-pool")
+async def browser_pool_stats():
+    return get_browser_pool().stats()
+
+@app.get("/api/cache/stats")
+async def response_cache_stats():
+    return get_response_cache().stats()
+
+@app.get("/api/debug/loop-lag")
+async def loop_lag_report():
+    if loop_monitor is None:
+        return {"enabled": False}
+    return loop_monitor.report()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if loop_monitor:
+        loop_monitor.start()
+
+background_tasks = set()
+
+@app.on_event("startup")
+async def start_leak_feed_refresh():
+    # Dark-web searches read a local copy of the leak feed kept fresh here
+    task = asyncio.create_task(refresh_leak_feed())
+    background_tasks.add(task)
+
+@app.on_event("shutdown")
+async def close_shared_clients():
+    if loop_monitor:
+        loop_monitor.stop()
+    for task in background_tasks:
+        task.cancel()
+    if _exif_pool is not None:
+        _exif_pool.shutdown(wait=False, cancel_futures=True)
+    await aclose_client()
+    await run_in_threadpool(get_browser_pool().close)
+
 @app.post("/api/deep-search")
 async def deep_search(request: DeepSearchRequest):
+    hashes = await run_in_threadpool(deep_search_index.hashes_for_url, request.image_url)
+    match = deep_search_index.lookup(hashes) if hashes else None
+    if match:
+        return dict(match["results"], cached=True)
+
     searcher = ReverseImageSearcher(headless=True)
     results = await searcher.search(request.image_url)
+    if hashes and any(results.values()):
+        deep_search_index.add(hashes, results, request.image_url)
     return results
 
+@app.get("/api/deep-search/stream")
+async def deep_search_stream(image_url: str):
+    """Server-Sent Events feed with one event per engine as it finishes."""
+    hashes = await run_in_threadpool(deep_search_index.hashes_for_url, image_url)
+    match = deep_search_index.lookup(hashes) if hashes else None
+    searcher = ReverseImageSearcher(headless=True)
+
+    async def events():
+        if match:
+            for engine, matches in match["results"].items():
+                yield f"event: engine\ndata: {json.dumps({'engine': engine, 'results': matches, 'cached': True})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+            return
+
+        results = {}
+        async for engine, matches in searcher.search_iter(image_url):
+            results[engine] = matches
+            yield f"event: engine\ndata: {json.dumps({'engine': engine, 'results': matches})}\n\n"
+        if hashes and any(results.values()):
+            deep_search_index.add(hashes, results, image_url)
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/footprint")
 async def footprint_scan(request: FootprintRequest):
     if request.type == "phone":
-        return get_phone_info(request.query)
+        # phonenumbers loads its metadata from disk on first use
+        return await run_in_threadpool(get_phone_info, request.query)
     elif request.type == "email":
         return await run_holehe(request.query)
     return {"error": "Invalid type"}
 
 @app.post("/api/network/scan")
-async def network_scan(request: NetworkRequest):
+async def network_scan(request: NetworkRequest, format: str = "json"):
     data = await scan_target(request.domain)
-    # Generate map HTML
     if "error" not in data:
-         graph_html = generate_network_map(data)
-         data["map_html"] = graph_html
+        # Nodes and edges for the frontend; ?format=html for the pyvis page
+        if format == "html":
+            data["map_html"] = await run_in_threadpool(generate_network_map, data)
+        else:
+            data["graph"] = await run_in_threadpool(build_graph, data)
     return data
 
 @app.post("/api/dark/search")
@@ -274,58 +538,56 @@ async def dark_search(request: DarkRequest):
 
 @app.post("/api/crypto/analyze")
 async def crypto_analyze(request: CryptoRequest):
-    return analyze_crypto(request.address, request.coin)
+    return await analyze_crypto(request.address, request.coin)
 
 @app.post("/api/ssl/scan")
 async def ssl_scan(request: SSLRequest):
-    return get_ssl_info(request.domain)
+    return await get_ssl_info(request.domain)
 
 @app.post("/api/tools/exif")
 async def tool_exif(request: ExifRequest):
-    return get_exif_data(request.url)
+    return await get_exif_data(request.url)
 
 # FILE UPLOAD for EXIF
 @app.post("/api/tools/exif/upload")
-async def tool_exif_upload(file: UploadFile = File(...)):
-    # Read bytes
-    content = await file.read()
-    # Modify get_exif_data to accept bytes. 
-    # Since we can't easily modify the module function signature without breaking it elsewhere or refactoring,
-    # let's duplicate the logic here or update the module.
-    # Actually, let's update the module logic in-place via a helper if possible.
-    # But for now, let's pass a byte stream if the module supports it or just use PIL directly here.
-    
-    from PIL import Image
-    from PIL.ExifTags import TAGS, GPSTAGS
-    from io import BytesIO
-    
-    results = {"source": file.filename, "basic": {}, "gps": {}, "error": None}
+def tool_exif_upload(file: UploadFile = File(...)):
+    # Plain def: FastAPI runs it in the threadpool, so decoding the image
+    # doesn't block the event loop. Pillow reads only the header of the
+    # spooled upload.
+    return extract_exif(file.file, file.filename)
+
+@app.post("/api/tools/exif/batch")
+async def tool_exif_batch(files: List[UploadFile] = File(...)):
+    """EXIF of several images or zip archives, one JSON line per image as
+    soon as it is parsed."""
+    workdir = tempfile.mkdtemp(prefix="tbb-exif-")
     try:
-        image = Image.open(BytesIO(content))
-        results["basic"]["format"] = image.format
-        results["basic"]["mode"] = image.mode
-        results["basic"]["size"] = f"{image.width}x{image.height}"
-        
-        exif_data = image._getexif()
-        if exif_data:
-            for tag_id, value in exif_data.items():
-                tag = TAGS.get(tag_id, tag_id)
-                if isinstance(value, bytes):
-                    try: value = value.decode()
-                    except: value = str(value)
-
-                if tag == "GPSInfo":
-                    gps_data = {}
-                    for t in value:
-                        sub_tag = GPSTAGS.get(t, t)
-                        gps_data[sub_tag] = str(value[t])
-                    results["gps"] = gps_data
-                else:
-                    if len(str(value)) < 500:
-                        results["basic"][tag] = value
-    except Exception as e:
-        results["error"] = str(e)
-    return results
+        spooled = await run_in_threadpool(spool_exif_uploads, files, workdir)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+    async def results():
+        loop = asyncio.get_running_loop()
+
+        async def parse(name, path):
+            try:
+                return await loop.run_in_executor(get_exif_pool(), extract_exif, path, name)
+            except Exception as e:
+                return {"source": name, "basic": {}, "gps": {}, "error": str(e)}
+
+        pending = [asyncio.ensure_future(parse(name, path)) for name, path in spooled["files"]]
+        try:
+            yield json.dumps({"files": len(pending), "skipped": spooled["skipped"]}) + "\n"
+            for next_done in asyncio.as_completed(pending):
+                result = await next_done
+                yield json.dumps(result, default=str) + "\n"
+        finally:
+            for future in pending:
+                future.cancel()
+            await run_in_threadpool(shutil.rmtree, workdir, True)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 @app.post("/api/tools/dork")
 async def tool_dork(request: DorkRequest):
@@ -337,7 +599,7 @@ async def tool_geoint(request: GeointRequest):
 
 @app.post("/api/tools/flight")
 async def tool_flight(request: FlightRequest):
-    return get_flight_radar(request.lat, request.lon, request.radius)
+    return await get_flight_radar(request.lat, request.lon, request.radius)
 
 
 # Serve static files for frontend
@@ -0,0 +1,90 @@
+"""Process-wide cache of the site manifest used by GUI scans.
+
+Building SitesInformation re-reads and re-parses data.json and rebuilds every
+SiteInformation, so the GUI loads it once and shares the result between jobs.
+The file is re-checked on every access (a cheap stat) and reloaded when its
+contents change; jobs that already took a snapshot keep using it.
+"""
+import hashlib
+import os
+import threading
+from types import MappingProxyType
+from typing import Optional
+
+from the_big_brother.gui.coalescer import definition_hash
+from the_big_brother.sites import SitesInformation
+
+
+class ManifestSnapshot:
+    def __init__(self, site_data: dict, digest: str):
+        self.site_data = MappingProxyType(site_data)
+        self.hashes = MappingProxyType({name: definition_hash(info) for name, info in site_data.items()})
+        self.digest = digest
+
+    def site_data_copy(self) -> dict:
+        """Per-job copy of the site data.
+
+        scan() stores its request futures in each site's dict, so jobs get
+        their own top-level dicts; nested values are shared and only read.
+        """
+        return {name: dict(info) for name, info in self.site_data.items()}
+
+    def __len__(self):
+        return len(self.site_data)
+
+
+class ManifestCache:
+    def __init__(self, data_file_path: str):
+        self.data_file_path = data_file_path
+        self._snapshot: Optional[ManifestSnapshot] = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ManifestSnapshot:
+        """Return the current snapshot, reloading it if the file changed."""
+        try:
+            stat = os.stat(self.data_file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            if self._snapshot is not None:
+                return self._snapshot
+            raise
+
+        snapshot = self._snapshot
+        if snapshot is not None and signature == self._signature:
+            return snapshot
+
+        # Only one thread reloads; the others carry on with the old snapshot.
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self._snapshot is not None and signature == self._signature:
+                return self._snapshot
+            self._reload(signature)
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def _reload(self, signature):
+        with open(self.data_file_path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+
+        if self._snapshot is not None and digest == self._snapshot.digest:
+            # Touched but not modified.
+            self._signature = signature
+            return
+
+        try:
+            sites_info = SitesInformation(data_file_path=self.data_file_path, honor_exclusions=False)
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            print(f"Manifest reload failed, keeping previous version: {e}")
+            # Don't retry until the file changes again.
+            self._signature = signature
+            return
+
+        site_data = {site.name: site.information for site in sites_info}
+        self._snapshot = ManifestSnapshot(site_data, digest)
+        self._signature = signature
+        print(f"[*] Loaded site manifest: {len(site_data)} sites ({digest[:12]})")
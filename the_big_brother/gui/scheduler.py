@@ -0,0 +1,180 @@
+"""Process-wide scheduler for GUI username scans.
+
+Every scan used to create its own 20-thread FuturesSession, so concurrent
+jobs multiplied both threads and connection pools. The scheduler owns one
+bounded set of HTTP worker threads and one connection pool for the whole
+process. Probes are handed out round-robin between jobs so a large scan does
+not starve the others, and only a limited number of jobs run at once while
+the rest wait in a FIFO queue.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from the_big_brother.scanner import BigBrotherFuturesSession
+
+
+class _Lane:
+    """Executor facade handed to a job's FuturesSession."""
+
+    def __init__(self, scheduler: "ScanScheduler", job_id: str):
+        self.scheduler = scheduler
+        self.job_id = job_id
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.scheduler._submit(self.job_id, fn, args, kwargs)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class ScanScheduler:
+    def __init__(self, max_workers: int = 32, max_active_jobs: int = 4):
+        self.max_workers = max_workers
+        self.max_active_jobs = max_active_jobs
+
+        # One adapter (and so one urllib3 pool per host) shared by every job.
+        # Jobs still get their own requests.Session so cookies don't leak.
+        self._adapter = HTTPAdapter(pool_connections=512, pool_maxsize=max_workers)
+
+        self._cond = threading.Condition()
+        self._lanes: "OrderedDict[str, deque]" = OrderedDict()
+        self._ready: deque = deque()
+        self._threads: list = []
+
+        self._active: set = set()
+        self._waiting: deque = deque()
+
+    def session(self, job_id: str) -> BigBrotherFuturesSession:
+        """Build a FuturesSession whose requests run on the shared workers."""
+        underlying_session = requests.session()
+        underlying_session.mount("http://", self._adapter)
+        underlying_session.mount("https://", self._adapter)
+        return BigBrotherFuturesSession(executor=_Lane(self, job_id), session=underlying_session)
+
+    @contextmanager
+    def admit(self, job_id: str, on_position: Optional[Callable[[int], None]] = None,
+              cancelled: Optional[Callable[[], bool]] = None):
+        """Wait for one of the active job slots, reporting the queue position.
+
+        Raises InterruptedError if ``cancelled`` returns True while waiting.
+        """
+        last_position = None
+        with self._cond:
+            self._waiting.append(job_id)
+        try:
+            while True:
+                with self._cond:
+                    if len(self._active) < self.max_active_jobs and self._waiting[0] == job_id:
+                        self._waiting.popleft()
+                        self._active.add(job_id)
+                        break
+                    position = self._waiting.index(job_id) + 1
+                if cancelled is not None and cancelled():
+                    raise InterruptedError("Stopped by user")
+                if position != last_position and on_position is not None:
+                    on_position(position)
+                    last_position = position
+                with self._cond:
+                    self._cond.wait(timeout=1)
+        except BaseException:
+            with self._cond:
+                if job_id in self._waiting:
+                    self._waiting.remove(job_id)
+                self._cond.notify_all()
+            raise
+
+        try:
+            yield
+        finally:
+            self.close_lane(job_id)
+            with self._cond:
+                self._active.discard(job_id)
+                self._cond.notify_all()
+
+    def queue_position(self, job_id: str) -> int:
+        """Return the 1-based queue position of a waiting job, 0 otherwise."""
+        with self._cond:
+            if job_id in self._waiting:
+                return self._waiting.index(job_id) + 1
+        return 0
+
+    def close_lane(self, job_id: str):
+        """Cancel the probes a job still has queued (e.g. after a stop)."""
+        with self._cond:
+            lane = self._lanes.pop(job_id, None)
+            if job_id in self._ready:
+                self._ready.remove(job_id)
+        while lane:
+            future, _, _, _ = lane.popleft()
+            future.cancel()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "max_active_jobs": self.max_active_jobs,
+                "active_jobs": len(self._active),
+                "queued_jobs": len(self._waiting),
+                "pending_probes": sum(len(lane) for lane in self._lanes.values()),
+            }
+
+    def _submit(self, job_id, fn, args, kwargs) -> Future:
+        future = Future()
+        with self._cond:
+            lane = self._lanes.setdefault(job_id, deque())
+            if not lane:
+                self._ready.append(job_id)
+            lane.append((future, fn, args, kwargs))
+            self._start_workers()
+            self._cond.notify_all()
+        return future
+
+    def _start_workers(self):
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._work, name=f"scan-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_item(self):
+        # Round-robin: take one probe from the job at the head of the ready
+        # queue and send that job to the back if it still has work.
+        with self._cond:
+            while not self._ready:
+                self._cond.wait()
+            job_id = self._ready.popleft()
+            lane = self._lanes[job_id]
+            item = lane.popleft()
+            if lane:
+                self._ready.append(job_id)
+            return item
+
+    def _work(self):
+        while True:
+            future, fn, args, kwargs = self._next_item()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+def create_scan_scheduler() -> ScanScheduler:
+    """Build the scheduler configured through the environment.
+
+    TBB_SCAN_WORKERS      -- HTTP worker threads shared by all jobs (default 32).
+    TBB_MAX_ACTIVE_SCANS  -- Jobs allowed to run at once; others queue (default 4).
+    """
+    return ScanScheduler(
+        max_workers=int(os.environ.get("TBB_SCAN_WORKERS", 32)),
+        max_active_jobs=int(os.environ.get("TBB_MAX_ACTIVE_SCANS", 4)),
+    )
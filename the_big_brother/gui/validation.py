@@ -0,0 +1,155 @@
+"""Validation stage of GUI scan jobs.
+
+CLAIMED hits are queued for validation as soon as the scan reports them, so
+checks overlap with the network probes still running. Each hit is first
+judged from the probe response the scanner already fetched; only hits that
+response can't settle are loaded in a headless browser. The worker thread
+runs its own event loop and validates up to ``concurrency`` hits at once on
+a pool of reusable browser contexts, started on the first escalation.
+Verdicts are cached by URL in the job store and reused by later jobs unless
+they ask for a refresh.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict
+
+from the_big_brother.validators.headless_validator import (
+    AsyncValidatorPool, DEFAULT_ALLOWED_RESOURCES, LinkValidationResult, check_probe_response
+)
+
+VALIDATION_CONCURRENCY = int(os.environ.get("TBB_VALIDATION_CONCURRENCY", 8))
+
+# Resource types validation pages may load ("all" disables blocking)
+_resources = os.environ.get("TBB_VALIDATION_RESOURCES", ",".join(DEFAULT_ALLOWED_RESOURCES))
+VALIDATION_RESOURCES = None if _resources == "all" else tuple(r.strip() for r in _resources.split(",") if r.strip())
+
+
+class ValidationPipeline:
+    def __init__(self, job_id: str, job, store, concurrency: int = VALIDATION_CONCURRENCY,
+                 refresh: bool = False):
+        self.job_id = job_id
+        self.job = job
+        self.store = store
+        self.concurrency = concurrency
+        self.refresh = refresh
+        self._queue = queue.Queue()
+        self._drained = False
+        self._thread = threading.Thread(target=self._run, name=f"validate-{job_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, entry: dict, probe=None):
+        """Queue a hit; ``probe`` is its QueryResult, carrying the probe response."""
+        self._queue.put((entry, probe))
+
+    def finish(self):
+        """Signal the end of the scan and wait for queued hits to be checked."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            asyncio.run(self._consume())
+        except Exception as e:
+            print(f"Validation error: {e}")
+            # Keep consuming so finish() never blocks on a dead worker
+            while not self._drained:
+                self._next()
+
+    def _next(self):
+        item = self._queue.get()
+        if item is None:
+            self._drained = True
+        return item
+
+    async def _consume(self):
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._probe_checks = 0
+        self._cache_hits = 0
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        try:
+            item = await asyncio.to_thread(self._next)
+            while item is not None:
+                task = asyncio.create_task(self._validate(slots, *item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                item = await asyncio.to_thread(self._next)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            if self._pool is not None:
+                await self._pool.__aexit__(None, None, None)
+
+        if self._pool is not None or self._probe_checks or self._cache_hits:
+            summary = (f"[*] Validated hits for job {self.job_id}: {self._cache_hits} from cache, "
+                       f"{self._probe_checks} from probe responses")
+            if self._pool is not None:
+                stats = self._pool.stats()
+                summary += (f", {stats['validations']} in the browser "
+                            f"({stats['bytes'] / 1024:.0f} KB transferred, {stats['avg_ms']} ms avg, "
+                            f"{stats['blocked_requests']} requests blocked)")
+            print(summary)
+
+    async def _browser(self) -> AsyncValidatorPool:
+        # Don't start a browser until a hit actually needs one.
+        async with self._pool_lock:
+            if self._pool is None:
+                pool = AsyncValidatorPool(size=self.concurrency, headless=True,
+                                          allowed_resources=VALIDATION_RESOURCES)
+                self._pool = await pool.__aenter__()
+            return self._pool
+
+    def _cached(self, url: str):
+        verdict = self.store.get_verdict(url)
+        if verdict is None:
+            return None
+        self._cache_hits += 1
+        return LinkValidationResult(**verdict, elapsed=0, tier="cache")
+
+    async def _validate(self, slots: asyncio.Semaphore, entry: dict, probe=None):
+        async with slots:
+            if self.store.stop_requested(self.job_id):
+                return
+            val_res = None if self.refresh else self._cached(entry["url"])
+            if val_res is None and probe is not None and getattr(probe, "http_status", None) is not None:
+                start = time.monotonic()
+                val_res = check_probe_response(entry["url"], probe.http_status, probe.final_url, probe.response_text)
+                if val_res is not None:
+                    val_res.elapsed = time.monotonic() - start
+                    self._probe_checks += 1
+
+            if val_res is None:
+                self.job.update_result(entry, validation="Checking...")
+                self.store.save(self.job_id, self.job)
+                pool = await self._browser()
+                val_res = await pool.validate(entry["url"])
+
+            if val_res.tier != "cache" and val_res.final_url is not None:
+                # Only verdicts reached by loading the page; errors are retried.
+                verdict = asdict(val_res)
+                for key in ("bytes_transferred", "elapsed", "blocked_requests", "tier"):
+                    verdict.pop(key)
+                self.store.put_verdict(entry["url"], verdict)
+
+        cost = {
+            "validation_ms": round(val_res.elapsed * 1000) if val_res.elapsed is not None else None,
+            "validation_bytes": val_res.bytes_transferred,
+            "validation_tier": val_res.tier,
+        }
+        if val_res.is_profile:
+            self.job.update_result(
+                entry,
+                validation="Verified",
+                page_title=val_res.title,
+                snippet=val_res.visible_text[:200] if val_res.visible_text else "",
+                **cost
+            )
+        else:
+            self.job.update_result(entry, validation="False Positive", reason=val_res.reason, **cost)
+        self.store.save(self.job_id, self.job)
@@ -1,105 +1,234 @@
 from duckduckgo_search import DDGS
-from playwright.sync_api import sync_playwright
+from the_big_brother.browser_pool import get_browser_pool
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Optional
+import asyncio
+import os
+import threading
 import time
 import random
 
-def fetch_images_google_playwright(query: str, limit: int = 3, headless: bool = True) -> list[str]:
+def fetch_images_google_playwright(query: str, limit: int = 3, headless: bool = True,
+                                   timeout: Optional[float] = None) -> list[str]:
     """Fallback: Fetch images using Playwright (Google Images)"""
     print(f"   [+] Attempting Google Images for {query}...")
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=headless)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                viewport={"width": 1920, "height": 1080},
-                locale="en-US"
-            )
-            page = context.new_page()
-            
-            # Google Images Search with SafeSearch OFF
-            page.goto(f"https://www.google.com/search?tbm=isch&q={query}&safe=off", timeout=15000)
-            
-            # Human-like delay
-            time.sleep(random.uniform(1.5, 3.0))
-
-            # Accept cookies if needed
-            try:
-                page.click("button:has-text('Reject all')", timeout=2000)
-            except: pass
-
-            images = page.evaluate("""() => {
-                const imgs = Array.from(document.querySelectorAll('img'));
-                return imgs
-                    .map(img => img.src || img.getAttribute('data-src'))
-                    .filter(src => src && src.startsWith('http') && src.length > 50 && !src.includes('googleg') && !src.includes('.svg')) 
-                    .slice(0, 5);
-            }""")
-            browser.close()
-            return images[:limit]
+        return get_browser_pool().run_sync(_google_images, query, limit, headless, timeout=timeout)
     except Exception as e:
         print(f"   [-] Google Playwright error: {e}")
         return []
 
-def fetch_images_bing_playwright(query: str, limit: int = 3, headless: bool = True) -> list[str]:
+async def _google_images(query: str, limit: int, headless: bool) -> list[str]:
+    async with get_browser_pool().lease(
+        "google-images",
+        headless=headless,
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        viewport={"width": 1920, "height": 1080},
+        locale="en-US"
+    ) as lease:
+        page = lease.page
+        
+        # Google Images Search with SafeSearch OFF
+        await page.goto(f"https://www.google.com/search?tbm=isch&q={query}&safe=off", timeout=15000)
+        
+        # Human-like delay
+        await asyncio.sleep(random.uniform(1.5, 3.0))
+
+        # Accept cookies if needed
+        try:
+            await page.click("button:has-text('Reject all')", timeout=2000)
+        except: pass
+
+        images = await page.evaluate("""() => {
+            const imgs = Array.from(document.querySelectorAll('img'));
+            return imgs
+                .map(img => img.src || img.getAttribute('data-src'))
+                .filter(src => src && src.startsWith('http') && src.length > 50 && !src.includes('googleg') && !src.includes('.svg')) 
+                .slice(0, 5);
+        }""")
+        return images[:limit]
+
+def fetch_images_bing_playwright(query: str, limit: int = 3, headless: bool = True,
+                                 timeout: Optional[float] = None) -> list[str]:
     """Fallback: Fetch images using Playwright (Bing Images)"""
     print(f"   [+] Attempting Bing Images for {query}...")
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=headless)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15",
-                viewport={"width": 1920, "height": 1080}
-            )
-            page = context.new_page()
-            
-            # Bing Images with SafeSearch OFF
-            page.goto(f"https://www.bing.com/images/search?q={query}&adlt=off", timeout=15000)
-            time.sleep(random.uniform(1.0, 2.5))
-            
-            images = page.evaluate("""() => {
-                const imgs = Array.from(document.querySelectorAll('.mimg'));
-                return imgs
-                    .map(img => img.src || img.getAttribute('data-src'))
-                    .filter(src => src && src.startsWith('http'))
-                    .slice(0, 5);
-            }""")
-            browser.close()
-            return images[:limit]
+        return get_browser_pool().run_sync(_bing_images, query, limit, headless, timeout=timeout)
     except Exception as e:
         print(f"   [-] Bing Playwright error: {e}")
         return []
 
-def fetch_images(query: str, limit: int = 3) -> list[str]:
-    """
-    Robust Multi-Engine Image Fetcher.
-    Strategy: DDGS (Fast) -> Bing (Medium) -> Google (Slow/Fallback).
-    """
-    print(f"[*] Starting Image Search for: {query}")
-    
-    # 1. Try DuckDuckGo (Fastest, API-like)
+async def _bing_images(query: str, limit: int, headless: bool) -> list[str]:
+    async with get_browser_pool().lease(
+        "bing-images",
+        headless=headless,
+        user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15",
+        viewport={"width": 1920, "height": 1080}
+    ) as lease:
+        page = lease.page
+        
+        # Bing Images with SafeSearch OFF
+        await page.goto(f"https://www.bing.com/images/search?q={query}&adlt=off", timeout=15000)
+        await asyncio.sleep(random.uniform(1.0, 2.5))
+        
+        images = await page.evaluate("""() => {
+            const imgs = Array.from(document.querySelectorAll('.mimg'));
+            return imgs
+                .map(img => img.src || img.getAttribute('data-src'))
+                .filter(src => src && src.startsWith('http'))
+                .slice(0, 5);
+        }""")
+        return images[:limit]
+
+# Image search results per query, so repeated jobs for the same name skip
+# the engines (and the browser) entirely.
+IMAGE_CACHE_TTL = float(os.environ.get("TBB_IMAGE_CACHE_TTL", 3600))
+IMAGE_CACHE_SIZE = 256
+_image_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+def _cached_images(query: str, limit: int) -> Optional[list[str]]:
+    key = query.strip().lower()
+    with _image_cache_lock:
+        cached = _image_cache.get(key)
+        if cached is None:
+            return None
+        stored_at, images = cached
+        if time.monotonic() - stored_at > IMAGE_CACHE_TTL:
+            del _image_cache[key]
+            return None
+        if len(images) < limit:
+            # Cached for a smaller request; look again for more.
+            return None
+        _image_cache.move_to_end(key)
+        return images[:limit]
+
+def _cache_images(query: str, images: list[str]):
+    if not images:
+        # Failures are not cached: the engines may recover.
+        return
+    with _image_cache_lock:
+        _image_cache[query.strip().lower()] = (time.monotonic(), list(images))
+        _image_cache.move_to_end(query.strip().lower())
+        while len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+
+def fetch_images_ddgs(query: str, limit: int = 3) -> list[str]:
+    """Fetch images using DuckDuckGo (Fastest, API-like)"""
+    print("   [+] Attempting DuckDuckGo...")
     try:
-        print("   [+] Attempting DuckDuckGo...")
         time.sleep(random.uniform(0.5, 1.5)) # Slight delay to be nice
         with DDGS() as ddgs:
             # simple search often works better than 'images' for rate limits
             ddgs_images = list(ddgs.images(query, max_results=5))
-            results = [r['image'] for r in ddgs_images if 'image' in r]
-            if results:
-                print(f"   [+] DDGS Success: Found {len(results)} images.")
-                return results[:limit]
+            return [r['image'] for r in ddgs_images if 'image' in r][:limit]
     except Exception as e:
-        print(f"   [-] DDGS Failed ({str(e)}). Moving to next engine.")
+        print(f"   [-] DDGS Failed ({str(e)}).")
+        return []
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+async def _race_engines(query: str, limit: int, stagger: float) -> list[str]:
+    """Start the engines one ``stagger`` apart (or as soon as the running ones
+    all failed) and keep the first that finds ``limit`` images."""
+    async def ddgs():
+        return await asyncio.to_thread(fetch_images_ddgs, query, limit)
+
+    async def bing():
+        print(f"   [+] Attempting Bing Images for {query}...")
+        return await _bing_images(query, limit, True)
+
+    async def google():
+        print(f"   [+] Attempting Google Images for {query}...")
+        return await _google_images(query, limit, True)
+
+    waiting = [("DDGS", ddgs), ("Bing", bing), ("Google", google)]
+    running = {}
+    best = []
+    try:
+        while waiting or running:
+            if waiting and (not running or not best):
+                name, engine = waiting.pop(0)
+                running[asyncio.create_task(engine())] = name
+            done, _ = await asyncio.wait(running, timeout=stagger if waiting else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    images = task.result()
+                except Exception as e:
+                    print(f"   [-] {name} error: {e}")
+                    continue
+                if len(images) >= limit:
+                    print(f"   [+] {name} won the race: Found {len(images)} images.")
+                    return images[:limit]
+                if len(images) > len(best):
+                    best = images
+            if not running and best:
+                break
+        return best[:limit]
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+def fetch_images(query: str, limit: int = 3, race: bool = True, stagger: float = 1.0,
+                 timeout: Optional[float] = None) -> list[str]:
+    """
+    Robust Multi-Engine Image Fetcher.
+    Strategy: DDGS (Fast) -> Bing (Medium) -> Google (Slow/Fallback).
+
+    With ``race`` the engines are started ``stagger`` seconds apart instead
+    of waiting for each other to fail, the first one to find ``limit``
+    images wins and the others are cancelled. Results are cached per query
+    for TBB_IMAGE_CACHE_TTL seconds. Browser searches still running after
+    ``timeout`` seconds are cancelled.
+    """
+    print(f"[*] Starting Image Search for: {query}")
+
+    cached = _cached_images(query, limit)
+    if cached is not None:
+        print(f"   [+] Cache hit: {len(cached)} images.")
+        return cached
+
+    if race:
+        try:
+            results = get_browser_pool().run_sync(_race_engines, query, limit, stagger, timeout=timeout)
+        except FutureTimeout:
+            print(f"   [-] Image race timed out after {timeout}s")
+            results = []
+        except Exception as e:
+            print(f"   [-] Image race failed: {e}")
+            results = []
+        if not results:
+            print("   [!] All image fetch methods failed.")
+        _cache_images(query, results)
+        return results
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    # 1. Try DuckDuckGo (Fastest, API-like)
+    results = fetch_images_ddgs(query, limit)
+    if results:
+        print(f"   [+] DDGS Success: Found {len(results)} images.")
+        _cache_images(query, results)
+        return results
     
     # 2. Try Bing (Playwright - generally lenient)
-    results = fetch_images_bing_playwright(query, limit)
+    results = fetch_images_bing_playwright(query, limit, timeout=_remaining(deadline))
     if results:
          print(f"   [+] Bing Success: Found {len(results)} images.")
+         _cache_images(query, results)
          return results
          
     # 3. Try Google (Playwright - Backup)
-    results = fetch_images_google_playwright(query, limit)
+    results = fetch_images_google_playwright(query, limit, timeout=_remaining(deadline))
     if results:
          print(f"   [+] Google Success: Found {len(results)} images.")
+         _cache_images(query, results)
          return results
 
     print("   [!] All image fetch methods failed.")
@@ -0,0 +1,211 @@
+"""Perceptual-hash index of recent deep searches.
+
+A reverse image search drives four browser sessions. Repeat searches for the
+same picture, or a re-encoded / resized copy of it, are answered from this
+index instead: every searched image is reduced to a 64-bit pHash and dHash,
+the pHashes live in a BK-tree for near-duplicate lookup within a Hamming
+radius, and the dHash confirms the match.
+"""
+import io
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import requests
+from PIL import Image
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """Difference hash: sign of horizontal gradients on a (size+1) x size thumbnail."""
+    pixels = np.asarray(image.convert("L").resize((size + 1, size), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return _to_int(bits)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(image: Image.Image, size: int = 8) -> int:
+    """DCT hash: low frequencies of a 32x32 thumbnail compared to their median."""
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    dct = _DCT_32 @ pixels @ _DCT_32.T
+    low = dct[:size, :size].flatten()
+    # The DC term only reflects overall brightness
+    bits = low > np.median(low[1:])
+    return _to_int(bits)
+
+
+def _to_int(bits) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")  # int.bit_count() needs Python 3.10
+
+
+def image_hashes(data: bytes) -> tuple:
+    """(pHash, dHash) of an encoded image."""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("L", (256, 256))  # JPEG: decode at reduced size
+        return phash(image), dhash(image)
+
+
+def download_image(url: str, timeout: float = 10) -> bytes:
+    with requests.get(url, timeout=timeout, stream=True,
+                      headers={"User-Agent": "Mozilla/5.0"}) as response:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            data.extend(chunk)
+            if len(data) > MAX_IMAGE_BYTES:
+                raise ValueError("Image too large")
+        return bytes(data)
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance."""
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def add(self, key: int, value):
+        self._size += 1
+        if self._root is None:
+            self._root = (key, [value], {})
+            return
+        node = self._root
+        while True:
+            node_key, values, children = node
+            distance = hamming(key, node_key)
+            if distance == 0:
+                values.append(value)
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (key, [value], {})
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> list:
+        """Every (distance, value) within ``radius`` of ``key``."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_key, values, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= radius:
+                found.extend((distance, value) for value in values)
+            # Triangle inequality: only these subtrees can hold matches
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+    def __len__(self):
+        return self._size
+
+
+class _Entry:
+    _keys = itertools.count()
+
+    def __init__(self, phash: int, dhash: int, results: dict, image_url: str):
+        self.key = next(self._keys)
+        self.phash = phash
+        self.dhash = dhash
+        self.results = results
+        self.image_url = image_url
+        self.stored_at = time.monotonic()
+
+
+class ImageIndex:
+    """Recent deep-search results keyed by perceptual hashes.
+
+    Entries expire after ``ttl`` seconds. A lookup matches an entry whose
+    pHash is within ``max_distance`` bits and whose dHash is within twice
+    that (dHash is more sensitive to small edits).
+    """
+
+    def __init__(self, ttl: float = 21600, max_distance: int = 6, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._tree = BKTree()
+        self._url_hashes: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0}
+
+    def hashes_for_url(self, image_url: str) -> Optional[tuple]:
+        """Download and hash ``image_url`` (memoized); None if it can't be read."""
+        with self._lock:
+            cached = self._url_hashes.get(image_url)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+        try:
+            hashes = image_hashes(download_image(image_url))
+        except Exception as e:
+            print(f"   [-] Could not hash {image_url}: {e}")
+            return None
+        with self._lock:
+            self._url_hashes[image_url] = (time.monotonic(), hashes)
+            while len(self._url_hashes) > self.max_entries:
+                self._url_hashes.popitem(last=False)
+        return hashes
+
+    def lookup(self, hashes: tuple) -> Optional[dict]:
+        """Results of the closest recent search of an equivalent image."""
+        phash_value, dhash_value = hashes
+        now = time.monotonic()
+        with self._lock:
+            self._stats["lookups"] += 1
+            candidates = []
+            for distance, entry in self._tree.search(phash_value, self.max_distance):
+                if now - entry.stored_at > self.ttl or entry.key not in self._entries:
+                    continue
+                d_distance = hamming(dhash_value, entry.dhash)
+                if d_distance <= self.max_distance * 2:
+                    candidates.append((distance, d_distance, entry))
+            if not candidates:
+                return None
+            self._stats["hits"] += 1
+            distance, _, entry = min(candidates, key=lambda c: (c[0], c[1], -c[2].stored_at))
+            return {"results": entry.results, "distance": distance, "image_url": entry.image_url,
+                    "age": round(now - entry.stored_at)}
+
+    def add(self, hashes: tuple, results: dict, image_url: str = ""):
+        entry = _Entry(hashes[0], hashes[1], results, image_url)
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._tree.add(entry.phash, entry)
+            self._prune()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, e in self._entries.items() if e.stored_at < cutoff]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        # BK-trees can't delete: rebuild once most nodes are dead.
+        if len(self._tree) > 2 * len(self._entries) + 64:
+            self._tree = BKTree()
+            for entry in self._entries.values():
+                self._tree.add(entry.phash, entry)
@@ -0,0 +1,170 @@
+"""Shared TTL cache for the intelligence modules' upstream lookups.
+
+Decorate an async lookup with ``@cached("module.source", ttl=...)``: its
+result is kept per arguments for ``ttl`` seconds (or for the TTL computed by
+``ttl_of`` from the result, e.g. DNS record TTLs). Failures are cached for
+the shorter ``negative_ttl`` so a dead upstream is not hammered either.
+
+Entries live in an in-memory LRU of TBB_CACHE_SIZE entries (default 4096).
+When TBB_CACHE_DB names a SQLite file they are also written there, so they
+survive restarts and are shared by the uvicorn workers.
+"""
+import asyncio
+import copy
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Optional
+
+
+def _failed(value) -> bool:
+    return not value or (isinstance(value, dict) and bool(value.get("error")))
+
+
+class _DiskBackend:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_expiry ON responses (expires_at)")
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, key: str, value, expires_at: float):
+        data = json.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, data, expires_at) VALUES (?, ?, ?)",
+                (key, data, expires_at),
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 4096, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskBackend(disk_path) if disk_path else None
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "negative_hits": 0, "stored": 0})
+
+    async def get(self, source: str, key: str):
+        """(True, value) on a hit, (False, None) on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self._disk is not None:
+            found = await asyncio.to_thread(self._disk.get, key)
+            if found is not None:
+                value, expires_at = found
+                entry = (expires_at, value, _failed(value))
+                self._remember(key, entry)
+
+        stats = self._stats[source]
+        if entry is None:
+            stats["misses"] += 1
+            return False, None
+        stats["hits"] += 1
+        if entry[2]:
+            stats["negative_hits"] += 1
+        return True, copy.deepcopy(entry[1])
+
+    async def put(self, source: str, key: str, value, ttl: float, failed: bool):
+        expires_at = time.time() + ttl
+        self._remember(key, (expires_at, copy.deepcopy(value), failed))
+        self._stats[source]["stored"] += 1
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.put, key, value, expires_at)
+            except Exception as e:
+                print(f"Cache write error: {e}")
+
+    def _remember(self, key: str, entry: tuple):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit rates per module, with a breakdown per source."""
+        modules = {}
+        for source, counts in sorted(self._stats.items()):
+            module = modules.setdefault(source.split(".")[0], {"hits": 0, "misses": 0, "negative_hits": 0,
+                                                               "stored": 0, "sources": {}})
+            for name, count in counts.items():
+                module[name] += count
+            module["sources"][source] = dict(counts, hit_rate=_rate(counts))
+        for module in modules.values():
+            module["hit_rate"] = _rate(module)
+        return {"entries": len(self._entries), "max_entries": self.max_entries,
+                "disk": self._disk is not None, "modules": modules}
+
+
+def _rate(counts: dict) -> float:
+    lookups = counts["hits"] + counts["misses"]
+    return round(counts["hits"] / lookups, 3) if lookups else 0.0
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide cache, configured through the environment.
+
+    TBB_CACHE_SIZE -- Entries kept in memory (default 4096).
+    TBB_CACHE_DB   -- Path of a SQLite file to also keep entries on disk.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                max_entries=int(os.environ.get("TBB_CACHE_SIZE", 4096)),
+                disk_path=os.environ.get("TBB_CACHE_DB") or None,
+            )
+        return _cache
+
+
+def cached(source: str, ttl: float, negative_ttl: float = 60,
+           ttl_of: Optional[Callable] = None, is_failure: Callable = _failed):
+    """Cache an async lookup per arguments under the name ``source``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            key = f"{source}:{json.dumps([args, kwargs], sort_keys=True, default=str)}"
+            hit, value = await cache.get(source, key)
+            if hit:
+                return value
+
+            value = await fn(*args, **kwargs)
+            failed = is_failure(value)
+            lifetime = negative_ttl if failed else (ttl_of(value) if ttl_of else ttl)
+            if lifetime > 0:
+                await cache.put(source, key, value, lifetime, failed)
+            return value
+        return wrapper
+    return decorate
@@ -1,7 +1,10 @@
-import requests
 import datetime
 
-def analyze_crypto(address: str, coin: str):
+from the_big_brother.modules.http_client import get_client
+from the_big_brother.modules.cache import cached
+
+@cached("crypto_analyzer.balance", ttl=120)
+async def analyze_crypto(address: str, coin: str):
     """
     Analyzes a crypto address for balance and activity.
     Supports BTC and ETH via free public APIs.
@@ -16,11 +19,12 @@ def analyze_crypto(address: str, coin: str):
         "error": None
     }
     
+    client = get_client()
     try:
         if coin.lower() == "btc":
             # using blockchain.info API
             url = f"https://blockchain.info/rawaddr/{address}"
-            resp = requests.get(url, timeout=10)
+            resp = await client.get(url, timeout=10)
             if resp.status_code == 200:
                 data = resp.json()
                 # satoshis to BTC
@@ -42,7 +46,7 @@ def analyze_crypto(address: str, coin: str):
             # Let's try blockchain.info/eth is not standard.
             # Using blockcypher
             url = f"https://api.blockcypher.com/v1/eth/main/addrs/{address}"
-            resp = requests.get(url, timeout=10)
+            resp = await client.get(url, timeout=10)
             if resp.status_code == 200:
                 data = resp.json()
                 # wei to ETH
@@ -1,84 +1,224 @@
-import requests
 from bs4 import BeautifulSoup
 import asyncio
+import json
+from array import array
+import os
+import time
+
+from the_big_brother.modules.http_client import get_client
+
+FEED_URL = "https://raw.githubusercontent.com/joshhighet/ransomwatch/main/posts.json"
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class LeakFeed:
+    """Local, indexed copy of the ransomwatch leak-site feed.
+
+    The feed (several MB) is kept in ``path`` and refreshed at most every
+    ``refresh`` seconds with a conditional GET, so unchanged feeds cost one
+    304. Posts are indexed by trigrams of their lowercased group and title:
+    a query only checks the posts containing all of its trigrams.
+    """
+
+    def __init__(self, path: str, refresh: float = 3600):
+        self.path = path
+        self.refresh = refresh
+        self._posts = []
+        self._texts = []
+        self._index = {}
+        self._validators = {}
+        self._checked_at = 0.0
+        self._refreshing = None
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._posts)
+
+    async def search(self, query: str) -> list:
+        if not self.loaded:
+            await asyncio.shield(self.schedule_update())
+        elif time.time() - self._checked_at > self.refresh:
+            self.schedule_update()
+        return [self._posts[i] for i in self._match(query.casefold())]
+
+    def schedule_update(self):
+        """Refresh in the background; queries keep using the current index."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self.update())
+        return self._refreshing
+
+    async def update(self):
+        if not self.loaded:
+            await asyncio.to_thread(self._load)
+        if time.time() - self._checked_at > self.refresh or not self.loaded:
+            await self._download()
+
+    async def _download(self):
+        headers = {}
+        if self.loaded and self._validators.get("etag"):
+            headers["If-None-Match"] = self._validators["etag"]
+        if self.loaded and self._validators.get("last_modified"):
+            headers["If-Modified-Since"] = self._validators["last_modified"]
+        try:
+            resp = await get_client().get(FEED_URL, headers=headers, timeout=30)
+            if resp.status_code == 304:
+                print("[*] Ransomwatch feed unchanged")
+            elif resp.status_code == 200:
+                validators = {"etag": resp.headers.get("etag"), "last_modified": resp.headers.get("last-modified")}
+                # Parsing and indexing take a while: keep them off the event loop
+                await asyncio.to_thread(self._store, resp.content, validators)
+                print(f"[*] Ransomwatch feed updated: {len(self._posts)} posts")
+            else:
+                print(f"Ransomwatch error: HTTP {resp.status_code}")
+                return
+            self._checked_at = time.time()
+            await asyncio.to_thread(self._save_meta)
+        except Exception as e:
+            print(f"Ransomwatch error: {e}")
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                self._build(json.loads(f.read()))
+            with open(self.path + ".meta") as f:
+                meta = json.load(f)
+            self._validators = meta.get("validators", {})
+            self._checked_at = meta.get("checked_at", 0.0)
+        except (OSError, ValueError):
+            pass
+
+    def _store(self, content: bytes, validators: dict):
+        self._build(json.loads(content))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, self.path)
+        self._validators = validators
+
+    def _save_meta(self):
+        try:
+            tmp = f"{self.path}.meta.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"validators": self._validators, "checked_at": self._checked_at}, f)
+            os.replace(tmp, self.path + ".meta")
+        except OSError as e:
+            print(f"Ransomwatch cache error: {e}")
+
+    def _build(self, data: list):
+        posts, texts, index = [], [], {}
+        for post in data:
+            # post fields: group_name, post_title, discovered, etc.
+            group = post.get("group_name") or ""
+            title = post.get("post_title") or ""
+            post_id = len(posts)
+            posts.append({
+                "title": f"[{group}] {title}",
+                "link": "#", # Usually no direct link in this JSON without digging, but group name is key
+                "snippet": f"Ransomware Leak Discovered: {post.get('discovered')}",
+                "date": post.get("discovered")
+            })
+            # Separate the fields so no match spans both
+            text = f"{group.casefold()}\n{title.casefold()}"
+            texts.append(text)
+            for gram in _trigrams(text):
+                # Compact posting lists: the feed has tens of thousands of posts
+                index.setdefault(gram, array("I")).append(post_id)
+        # Swap in the new index at once for concurrent queries
+        self._posts, self._texts, self._index = posts, texts, index
+
+    def _match(self, query: str) -> list:
+        texts = self._texts
+        grams = _trigrams(query)
+        if not grams:
+            return [i for i, text in enumerate(texts) if query in text]
+        postings = sorted((self._index.get(gram, ()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(i for i in candidates if query in texts[i])
+
+
+leak_feed = LeakFeed(
+    path=os.environ.get("TBB_LEAK_FEED", os.path.join("data", "ransomwatch_posts.json")),
+    refresh=float(os.environ.get("TBB_LEAK_FEED_REFRESH", 3600)),
+)
+
 
 async def search_ransomware_leaks(query: str):
     """
     Searches known ransomware leak sites via Ransomwatch feed.
     """
-    url = "https://raw.githubusercontent.com/joshhighet/ransomwatch/main/posts.json"
     try:
-        resp = await asyncio.to_thread(requests.get, url, timeout=10)
-        data = resp.json()
-        
-        matches = []
-        query_lower = query.lower()
-        
-        for post in data:
-            # post fields: group_name, post_title, discovered, etc.
-            title = post.get("post_title", "").lower()
-            group = post.get("group_name", "").lower()
-            
-            if query_lower in title or query_lower in group:
-                matches.append({
-                    "title": f"[{post.get('group_name')}] {post.get('post_title')}",
-                    "link": "#", # Usually no direct link in this JSON without digging, but group name is key
-                    "snippet": f"Ransomware Leak Discovered: {post.get('discovered')}",
-                    "date": post.get("discovered")
-                })
-        return matches
+        return await leak_feed.search(query)
     except Exception as e:
         print(f"Ransomwatch error: {e}")
         return []
 
-async def search_dark_web(query: str):
+async def refresh_leak_feed():
+    """Keep the leak feed fresh; run for the lifetime of the server."""
+    while True:
+        await asyncio.shield(leak_feed.schedule_update())
+        await asyncio.sleep(leak_feed.refresh)
+
+async def search_ahmia(query: str):
     """
-    Searches Ahmia.fi for onion links AND checks ransomware leaks.
+    Searches Ahmia.fi for onion links.
     """
-    results = []
-    
-    # 1. Ransomware Search
-    ransom_results = await search_ransomware_leaks(query)
-    results.extend(ransom_results)
-    
-    # 2. Onion Search (Ahmia)
     url = f"https://ahmia.fi/search/?q={query}"
     
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; rv:91.0) Gecko/20100101 Firefox/91.0"
     }
     
-    try:
-        resp = await asyncio.to_thread(requests.get, url, headers=headers, timeout=10)
-        
-        if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            for li in soup.find_all('li', class_='result'):
-                try:
-                    link = li.find('a')['href']
-                    title = li.find('a').text.strip()
-                    snippet = li.find('p').text.strip() if li.find('p') else "No description"
-                    
-                    date = li.find('span', class_='modified')
-                    date_str = date.text.strip() if date else "Unknown Date"
-                    
-                    results.append({
-                        "title": title,
-                        "link": link,
-                        "snippet": snippet,
-                        "date": date_str
-                    })
-                except:
-                    continue
-                    
-        return {"results": results, "count": len(results)}
+    results = []
+    resp = await get_client().get(url, headers=headers, timeout=10)
+    
+    if resp.status_code == 200:
+        soup = await asyncio.to_thread(BeautifulSoup, resp.text, 'html.parser')
         
-    except Exception as e:
+        for li in soup.find_all('li', class_='result'):
+            try:
+                link = li.find('a')['href']
+                title = li.find('a').text.strip()
+                snippet = li.find('p').text.strip() if li.find('p') else "No description"
+                
+                date = li.find('span', class_='modified')
+                date_str = date.text.strip() if date else "Unknown Date"
+                
+                results.append({
+                    "title": title,
+                    "link": link,
+                    "snippet": snippet,
+                    "date": date_str
+                })
+            except:
+                continue
+    return results
+
+async def search_dark_web(query: str):
+    """
+    Searches Ahmia.fi for onion links AND checks ransomware leaks.
+    """
+    # Both lookups run at once
+    ransom_results, onion_results = await asyncio.gather(
+        search_ransomware_leaks(query), search_ahmia(query), return_exceptions=True
+    )
+    results = list(ransom_results) if isinstance(ransom_results, list) else []
+
+    if isinstance(onion_results, Exception):
         # Return what we have if Ahmia fails
         if results:
              return {"results": results, "count": len(results)}
-        return {"error": str(e)}
+        return {"error": str(onion_results)}
+
+    results.extend(onion_results)
+    return {"results": results, "count": len(results)}
 
 async def check_tor_status(onion_url: str):
     """
@@ -94,7 +234,7 @@ async def check_tor_status(onion_url: str):
         gateway_url = "http://" + gateway_url
         
     try:
-        resp = await asyncio.to_thread(requests.head, gateway_url, timeout=5)
+        resp = await get_client().head(gateway_url, timeout=5, follow_redirects=False)
         return {"status": "Online" if resp.status_code == 200 else "Offline", "code": resp.status_code}
     except:
         return {"status": "Unreachable", "code": 0}
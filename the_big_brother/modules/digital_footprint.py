@@ -4,7 +4,7 @@ from phonenumbers import geocoder, carrier, timezone
 import asyncio
 import subprocess
 import json
-import dns.resolver
+import dns.asyncresolver
 
 async def check_email_osint(email: str):
     """
@@ -90,7 +90,7 @@ async def run_holehe(email: str):
     # 1. MX Record Check
     try:
         domain = email.split('@')[-1]
-        mx_records = dns.resolver.resolve(domain, 'MX')
+        mx_records = await dns.asyncresolver.resolve(domain, 'MX')
         for mx in mx_records:
             results["mx_records"].append(str(mx.exchange))
         if results["mx_records"]:
@@ -1,40 +1,134 @@
 from PIL import Image
 from PIL.ExifTags import TAGS, GPSTAGS
-import requests
+import asyncio
+import os
 from io import BytesIO
 
-def get_exif_data(image_source: str, is_url: bool = True):
+from the_big_brother.modules.http_client import get_client
+from the_big_brother.modules.cache import cached
+
+# Most bytes read from an image; metadata normally sits in the first few KB
+EXIF_MAX_BYTES = int(os.environ.get("TBB_EXIF_MAX_BYTES", 4 * 1024 * 1024))
+
+def _header_complete(data: bytes) -> bool:
+    """Whether ``data`` holds every metadata segment of the image.
+
+    JPEG metadata precedes the start of scan (SOS) and PNG metadata the
+    first IDAT chunk; other formats are read to the end (or the cap).
+    """
+    if data.startswith(b"\xff\xd8"):
+        pos = 2
+        while pos + 4 <= len(data):
+            if data[pos] != 0xFF:
+                return True  # Corrupt: Pillow will tell
+            marker = data[pos + 1]
+            if marker == 0xDA:
+                # Pillow reads the whole SOS segment header while opening
+                return pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big") <= len(data)
+            if marker == 0xFF:
+                pos += 1  # Fill byte
+            elif 0xD0 <= marker <= 0xD7 or marker == 0x01:
+                pos += 2
+            else:
+                pos += 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        return False
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        pos = 8
+        while pos + 8 <= len(data):
+            if data[pos + 4:pos + 8] in (b"IDAT", b"IEND"):
+                return True
+            pos += 12 + int.from_bytes(data[pos:pos + 4], "big")
+        return False
+    return False
+
+async def fetch_image_header(url: str, max_bytes: int = EXIF_MAX_BYTES):
+    """Download the start of an image, up to its metadata.
+
+    Asks for at most ``max_bytes`` with a Range request and stops reading as
+    soon as the metadata segments are in, for servers that ignore ranges too.
+    Returns ``(status, data, transfer)``; ``transfer`` reports the bytes
+    fetched against the full size of the image.
+    """
+    headers = {"Range": f"bytes=0-{max_bytes - 1}"}
+    data = bytearray()
+    async with get_client().stream("GET", url, headers=headers, timeout=10) as resp:
+        if resp.status_code not in (200, 206):
+            return resp.status_code, b"", {}
+        full_size = None
+        content_range = resp.headers.get("content-range", "")
+        if resp.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            full_size = int(total) if total.isdigit() else None
+        elif resp.headers.get("content-length", "").isdigit():
+            full_size = int(resp.headers["content-length"])
+
+        complete = False
+        async for chunk in resp.aiter_bytes():
+            data.extend(chunk)
+            del data[max_bytes:]
+            if _header_complete(data):
+                complete = True
+                break
+            if len(data) >= max_bytes:
+                break
+    transfer = {
+        "bytes_fetched": len(data),
+        "full_size": full_size,
+        "range_supported": resp.status_code == 206,
+        "complete": complete or (full_size is not None and len(data) >= full_size),
+    }
+    return resp.status_code, bytes(data), transfer
+
+@cached("exif_analyzer.image", ttl=3600)
+async def get_exif_data(image_source: str, is_url: bool = True):
     """
-    Extracts EXIF data from an image URL or local file (simulated via bytes).
+    Extracts EXIF data from an image URL or a local file path.
+    """
+    try:
+        if not is_url:
+            return await asyncio.to_thread(extract_exif, image_source, image_source)
+
+        status, content, transfer = await fetch_image_header(image_source)
+        if not content:
+             return {"error": f"Failed to download image: {status}"}
+
+        # Decoding is CPU work: keep it off the event loop
+        results = await asyncio.to_thread(extract_exif, content, image_source)
+        results["transfer"] = transfer
+        return results
+    except Exception as e:
+        return {"source": image_source, "basic": {}, "gps": {}, "error": str(e)}
+
+def extract_exif(image, source: str = ""):
+    """
+    Reads the format, size, EXIF tags and GPS data of an image.
+
+    ``image`` is the encoded image, a path or a binary file object; Pillow
+    only reads the header, not the pixel data. Runs in worker threads and
+    processes, so it must stay a picklable module-level function.
     """
     results = {
-        "source": image_source,
+        "source": source,
         "basic": {},
         "gps": {},
         "error": None
     }
-    
     try:
-        image = None
-        if is_url:
-            resp = requests.get(image_source, timeout=10)
-            if resp.status_code == 200:
-                image = Image.open(BytesIO(resp.content))
+        if isinstance(image, (bytes, bytearray)):
+            image = BytesIO(image)
+        with Image.open(image) as img:
+            # Basic Info
+            results["basic"]["format"] = img.format
+            results["basic"]["mode"] = img.mode
+            results["basic"]["size"] = f"{img.width}x{img.height}"
+
+            # A PNG's eXIf chunk precedes its pixel data, so it is in
+            # img.info once opened; without one, _getexif() would decode the
+            # pixels, which header-only downloads don't have.
+            if img.format == "PNG" and "exif" not in img.info:
+                exif_data = None
             else:
-                 return {"error": f"Failed to download image: {resp.status_code}"}
-        else:
-             # For now we only support URL in this quick implementation
-             return {"error": "Local file upload not implemented in this version"}
-
-        if not image:
-             return {"error": "Could not open image"}
-
-        # Basic Info
-        results["basic"]["format"] = image.format
-        results["basic"]["mode"] = image.mode
-        results["basic"]["size"] = f"{image.width}x{image.height}"
-        
-        exif_data = image._getexif()
+                exif_data = img._getexif() if hasattr(img, "_getexif") else None
         if not exif_data:
             return results # No exif
 
@@ -60,6 +154,9 @@ def get_exif_data(image_source: str, is_url: bool = True):
                     results["basic"][tag] = value
 
     except Exception as e:
-        results["error"] = str(e)
+        error = str(e)
+        if isinstance(image, str) and source:
+            error = error.replace(image, source)  # Spooled batch files have no useful path
+        results["error"] = error
         
     return results
@@ -1,7 +1,10 @@
-import requests
 import datetime
 
-def get_flight_radar(lat: float, lon: float, radius_km: float = 100):
+from the_big_brother.modules.http_client import get_client
+from the_big_brother.modules.cache import cached
+
+@cached("flight_radar.opensky", ttl=15)
+async def get_flight_radar(lat: float, lon: float, radius_km: float = 100):
     """
     Fetches real-time flight data near the target coordinates.
     Uses OpenSky Network API (Free tier).
@@ -24,7 +27,7 @@ def get_flight_radar(lat: float, lon: float, radius_km: float = 100):
     }
     
     try:
-        resp = requests.get(url, timeout=10)
+        resp = await get_client().get(url, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             states = data.get("states", [])
@@ -1,5 +1,3 @@
-import requests
-
 def get_geoint_data(lat: str, lon: str):
     """
     Generates a GEOINT package for the given coordinates.
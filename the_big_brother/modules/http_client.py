@@ -0,0 +1,33 @@
+"""Shared async HTTP client for the modules.
+
+Every lookup used to open its own connection (and TLS session) with a
+blocking requests call. The modules now borrow one pooled, keep-alive
+httpx.AsyncClient instead. A client is bound to the event loop that uses it,
+so there is one per loop.
+"""
+import asyncio
+import weakref
+
+import httpx
+
+LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> httpx.AsyncClient:
+    """The pooled client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=LIMITS, timeout=TIMEOUT, follow_redirects=True)
+        _clients[loop] = client
+    return client
+
+
+async def aclose_client():
+    """Close the running loop's client, e.g. on application shutdown."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,10 +1,17 @@
 import socket
 import asyncio
-import requests
+import json
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
 from pyvis.network import Network
 import tempfile
 import os
-import dns.resolver
+import dns.asyncresolver
+
+from the_big_brother.modules.http_client import get_client
+from the_big_brother.modules.cache import cached
 
 COMMON_PORTS = {
     21: "FTP", 22: "SSH", 23: "Telnet", 25: "SMTP", 53: "DNS", 80: "HTTP",
@@ -12,6 +19,11 @@ COMMON_PORTS = {
     5432: "PostgreSQL", 8080: "HTTP-Alt"
 }
 
+# Seconds each stage of scan_target may take before its result is dropped
+STAGE_TIMEOUTS = {
+    "resolve": 5, "ports": 5, "geoip": 6, "whois": 6, "dns": 5, "subdomains": 15, "hosts": 15,
+}
+
 async def check_port(ip, port):
     conn = asyncio.open_connection(ip, port)
     try:
@@ -22,19 +34,21 @@ async def check_port(ip, port):
     except:
         return port, False
 
-def get_geoip(ip):
+@cached("network_mapper.geoip", ttl=86400, is_failure=lambda v: not v or v.get("status") == "fail")
+async def get_geoip(ip):
     try:
-        resp = requests.get(f"http://ip-api.com/json/{ip}", timeout=5)
+        resp = await get_client().get(f"http://ip-api.com/json/{ip}", timeout=5)
         if resp.status_code == 200:
             return resp.json()
     except:
         pass
     return {}
 
-def get_rdap_whois(domain):
+@cached("network_mapper.rdap", ttl=86400)
+async def get_rdap_whois(domain):
     try:
         # RDAP is the new JSON standard for WHOIS
-        resp = requests.get(f"https://rdap.org/domain/{domain}", timeout=5)
+        resp = await get_client().get(f"https://rdap.org/domain/{domain}", timeout=5)
         if resp.status_code == 200:
             data = resp.json()
             # Extract key info safely
@@ -47,99 +61,358 @@ def get_rdap_whois(domain):
         pass
     return {}
 
-def get_dns_records(domain):
-    records = {"MX": [], "NS": [], "TXT": []}
-    try:
-        resolver = dns.resolver.Resolver()
+_resolver = None
+
+def _get_resolver():
+    """Shared resolver, built on first use: creating one reads
+    /etc/resolv.conf, which some hosts don't have at import time."""
+    global _resolver
+    if _resolver is None:
+        resolver = dns.asyncresolver.Resolver()
         resolver.timeout = 2
         resolver.lifetime = 2
-        
-        try:
-            for r in resolver.resolve(domain, 'MX'):
-                records["MX"].append(str(r.exchange))
-        except: pass
-        
-        try:
-            for r in resolver.resolve(domain, 'NS'):
-                records["NS"].append(str(r.target))
-        except: pass
-        
-        try:
-            for r in resolver.resolve(domain, 'TXT'):
-                records["TXT"].append(str(r))
-        except: pass
-        
+        _resolver = resolver
+    return _resolver
+
+_RDATA_TEXT = {
+    "MX": lambda r: str(r.exchange),
+    "NS": lambda r: str(r.target),
+    "TXT": str,
+}
+
+# Answers are reused for as long as their records' TTL allows
+@cached("network_mapper.dns", ttl=300, ttl_of=lambda v: v["ttl"], is_failure=lambda v: not v["records"])
+async def _lookup(domain, rdtype):
+    try:
+        answer = await _get_resolver().resolve(domain, rdtype)
+        return {"records": [_RDATA_TEXT[rdtype](r) for r in answer], "ttl": answer.rrset.ttl}
+    except Exception:
+        return {"records": [], "ttl": 0}
+
+async def get_dns_records(domain):
+    records = {"MX": [], "NS": [], "TXT": []}
+    try:
+        answers = await asyncio.gather(*(_lookup(domain, rdtype) for rdtype in records))
+        for rdtype, answer in zip(list(records), answers):
+            records[rdtype] = answer["records"]
+
     except Exception as e:
         print(f"DNS Error: {e}")
     return records
 
+# Names kept per crt.sh answer (TBB_MAX_SUBDOMAINS)
+MAX_SUBDOMAINS = int(os.environ.get("TBB_MAX_SUBDOMAINS", 5000))
+
+# Undecodable text kept before giving up: one entry is far smaller, so more
+# than this means crt.sh sent something else (an error or rate-limit page)
+MAX_UNDECODED = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+def _parse_entries(buffer: str, pos: int):
+    """Decode the complete entries of a crt.sh JSON array read so far.
+
+    Returns the entries and the position of the first undecoded one.
+    """
+    entries = []
+    length = len(buffer)
+    while pos < length:
+        # Skip the array brackets, separators and whitespace between entries
+        while pos < length and buffer[pos] in "[], \t\r\n":
+            pos += 1
+        if pos >= length:
+            break
+        try:
+            entry, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            break  # Incomplete entry: wait for more data
+        entries.append(entry)
+        pos = end
+    return entries, pos
+
+@cached("network_mapper.crtsh", ttl=3600, is_failure=lambda v: not v["names"] or v["partial"])
+async def get_subdomains(domain):
+    """Subdomains of ``domain`` in its certificate transparency history.
+
+    The answer is parsed as it streams in, so huge histories are never held
+    in memory: at most MAX_SUBDOMAINS names are kept and reading stops there
+    (``truncated``) or shortly before the stage times out (``partial``).
+    """
+    domain = domain.strip().lower().rstrip(".")
+    suffix = "." + domain
+    subs = set()
+    result = {"names": [], "entries": 0, "truncated": False, "partial": False}
+    deadline = asyncio.get_running_loop().time() + STAGE_TIMEOUTS["subdomains"] - 1
+    try:
+        url = f"https://crt.sh/?q=%.{domain}&output=json"
+        async with get_client().stream("GET", url, timeout=STAGE_TIMEOUTS["subdomains"]) as resp:
+            if resp.status_code != 200:
+                return result
+            buffer, pos = "", 0
+            async for chunk in resp.aiter_text():
+                buffer += chunk
+                entries, pos = _parse_entries(buffer, pos)
+                buffer, pos = buffer[pos:], 0
+                if not entries and len(buffer) > MAX_UNDECODED:
+                    result["error"] = "crt.sh did not return JSON"
+                    result["partial"] = bool(subs)
+                    break
+                for entry in entries:
+                    result["entries"] += 1
+                    for name in entry.get("name_value", "").split("\n"):
+                        name = name.strip().lower().rstrip(".")
+                        if name.endswith(suffix) and "*" not in name and name not in subs:
+                            subs.add(sys.intern(name))
+                if len(subs) >= MAX_SUBDOMAINS:
+                    result["truncated"] = True
+                    break
+                if asyncio.get_running_loop().time() > deadline:
+                    result["partial"] = True
+                    break
+    except Exception as e:
+        print(f"Subdomain Error: {e}")
+        result["partial"] = bool(subs)
+    result["names"] = sorted(subs)[:MAX_SUBDOMAINS]
+    return result
+
+# Subdomains resolved per scan, and lookups in flight at once
+MAX_RESOLVE = int(os.environ.get("TBB_MAX_RESOLVE", 1000))
+RESOLVE_CONCURRENCY = int(os.environ.get("TBB_RESOLVE_CONCURRENCY", 50))
+
+@cached("network_mapper.resolve", ttl=300, ttl_of=lambda v: v["ttl"], is_failure=lambda v: not v["ips"])
+async def _resolve_a(name):
+    try:
+        answer = await _get_resolver().resolve(name, "A")
+        return {"ips": sorted({r.address for r in answer}), "ttl": answer.rrset.ttl}
+    except Exception:
+        return {"ips": [], "ttl": 0}
+
+@cached("network_mapper.asn", ttl=86400)
+async def _asn_batch(ips):
+    try:
+        resp = await get_client().post(
+            "http://ip-api.com/batch",
+            json=[{"query": ip, "fields": "status,query,as,isp,countryCode"} for ip in ips], timeout=5)
+        if resp.status_code == 200:
+            return {r["query"]: r for r in resp.json() if r.get("status") == "success"}
+    except Exception as e:
+        print(f"ASN lookup error: {e}")
+    return {}
+
+async def resolve_hosts(names, timeout: float = None):
+    """Resolve ``names`` concurrently and group them by address.
+
+    Returns ``(hosts, unresolved)``: one entry per IP with its names and AS
+    (looked up through the ip-api batch endpoint), and the number of names
+    that did not resolve (or not in time).
+    """
+    names = names[:MAX_RESOLVE]
+    timeout = timeout if timeout is not None else STAGE_TIMEOUTS["hosts"] - 3
+    limit = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+    async def resolve(name):
+        async with limit:
+            return name, await _resolve_a(name)
+
+    tasks = [asyncio.ensure_future(resolve(name)) for name in names]
+    hosts = {}
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            name, answer = task.result()
+            for ip in answer["ips"]:
+                hosts.setdefault(ip, {"ip": ip, "names": []})["names"].append(name)
+    resolved = {name for host in hosts.values() for name in host["names"]}
+
+    ips = sorted(hosts)
+    batches = await asyncio.gather(*(_asn_batch(ips[i:i + 100]) for i in range(0, len(ips), 100)))
+    for batch in batches:
+        for ip, info in batch.items():
+            hosts[ip].update(asn=info.get("as", ""), isp=info.get("isp", ""), country=info.get("countryCode", ""))
+    for host in hosts.values():
+        host["names"].sort()
+    return sorted(hosts.values(), key=lambda h: (-len(h["names"]), h["ip"])), len(names) - len(resolved)
+
+async def scan_ports(ip):
+    port_results = await asyncio.gather(*(check_port(ip, p) for p in COMMON_PORTS.keys()))
+    return [{"port": port, "service": COMMON_PORTS[port]} for port, is_open in port_results if is_open]
+
+async def _stage(name, coro, default, timed_out):
+    try:
+        return await asyncio.wait_for(coro, timeout=STAGE_TIMEOUTS[name])
+    except asyncio.TimeoutError:
+        print(f"Network scan: {name} timed out")
+        timed_out.append(name)
+        return default
+
 async def scan_target(domain: str):
     """
     Scans a target for IP, open ports, subdomains, GeoIP, Whois, and DNS.
+    Every stage runs concurrently under its own timeout.
     """
     results = {
         "domain": domain,
         "ip": None,
         "ports": [],
         "subdomains": [],
+        "subdomain_stats": {},
+        "hosts": [],
         "geoip": {},
         "whois": {},
-        "dns": {}
+        "dns": {},
+        "timed_out": []
     }
-    
+    timed_out = results["timed_out"]
+
+    # Stages that only need the domain start right away
+    whois = asyncio.ensure_future(_stage("whois", get_rdap_whois(domain), {}, timed_out))
+    dns_records = asyncio.ensure_future(_stage("dns", get_dns_records(domain), {"MX": [], "NS": [], "TXT": []}, timed_out))
+    subdomains = asyncio.ensure_future(_stage("subdomains", get_subdomains(domain),
+                                                {"names": [], "entries": 0, "truncated": False, "partial": True},
+                                                timed_out))
+
     # Resolve IP
     try:
-        results["ip"] = socket.gethostbyname(domain)
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(domain, None, family=socket.AF_INET),
+            timeout=STAGE_TIMEOUTS["resolve"])
+        results["ip"] = infos[0][4][0]
     except:
+        for task in (whois, dns_records, subdomains):
+            task.cancel()
+        await asyncio.gather(whois, dns_records, subdomains, return_exceptions=True)
         return {"error": "Could not resolve domain"}
-        
-    # Parallel Tasks
-    # 1. Port Scan
-    port_tasks = [check_port(results["ip"], p) for p in COMMON_PORTS.keys()]
-    
-    # 2. GeoIP (Sync but fast enough, or thread it)
-    results["geoip"] = await asyncio.to_thread(get_geoip, results["ip"])
-    
-    # 3. Whois
-    results["whois"] = await asyncio.to_thread(get_rdap_whois, domain)
-    
-    # 4. DNS
-    results["dns"] = await asyncio.to_thread(get_dns_records, domain)
-
-    # 5. Execute Port Scan
-    port_results = await asyncio.gather(*port_tasks)
-    
-    for port, is_open in port_results:
-        if is_open:
-            results["ports"].append({"port": port, "service": COMMON_PORTS[port]})
-            
-    # 6. Subdomains (crt.sh)
-    try:
-        url = f"https://crt.sh/?q=%.{domain}&output=json"
-        resp = await asyncio.to_thread(requests.get, url, timeout=5)
-        if resp.status_code == 200:
-            data = resp.json()
-            subs = set()
-            for entry in data:
-                name = entry['name_value']
-                for n in name.split('\n'):
-                    if n.endswith(domain) and n != domain and "*" not in n:
-                        subs.add(n)
-            results["subdomains"] = list(subs)
-    except Exception as e:
-        print(f"Subdomain Error: {e}")
-        
+
+    (results["ports"], results["geoip"], results["whois"],
+     results["dns"], crtsh) = await asyncio.gather(
+        _stage("ports", scan_ports(results["ip"]), [], timed_out),
+        _stage("geoip", get_geoip(results["ip"]), {}, timed_out),
+        whois, dns_records, subdomains,
+    )
+    results["subdomains"] = crtsh["names"]
+    results["subdomain_stats"] = {k: crtsh[k] for k in ("entries", "truncated", "partial")}
+    if crtsh.get("error"):
+        results["subdomain_stats"]["error"] = crtsh["error"]
+
+    # Where the subdomains live, grouped by address
+    results["hosts"], results["subdomain_stats"]["unresolved"] = await _stage(
+        "hosts", resolve_hosts(results["subdomains"]), ([], len(results["subdomains"])), timed_out)
+
     return results
 
-def generate_network_map(data):
+# Children drawn per node; larger sets are split into cluster nodes that the
+# frontend expands on demand
+GRAPH_FANOUT = 20
+
+# Node styles, sent once as vis-network groups instead of on every node
+GRAPH_GROUPS = {
+    "domain": {"color": "#00ff41", "shape": "star", "size": 30},
+    "host": {"color": "#ffcc00", "shape": "diamond"},
+    "port": {"color": "#ff0000", "shape": "dot", "size": 10},
+    "mx": {"color": "#00ccff", "shape": "triangle"},
+    "ns": {"color": "#ff00ff", "shape": "triangle"},
+    "asn": {"color": "#ff8800", "shape": "square", "size": 20},
+    "subdomain": {"color": "#00cc00", "shape": "dot", "size": 15},
+    "cluster": {"color": "#00cc00", "shape": "hexagon", "size": 20},
+    "unresolved": {"color": "#666666", "shape": "hexagon", "size": 15},
+}
+
+class _Graph:
+    def __init__(self):
+        self.nodes = {}
+        self.edges = []
+
+    def add(self, node_id, label, group, parent=None, cluster=None):
+        """Add a node (once) and its edge from ``parent``.
+
+        ``parent`` of the first edge is kept on the node so the frontend
+        can hide everything below a collapsed ``cluster`` node.
+        """
+        if node_id not in self.nodes:
+            node = {"id": node_id, "group": group}
+            if label != node_id:
+                node["label"] = label
+            if parent is not None:
+                node["parent"] = parent
+            if cluster:
+                node["cluster"] = cluster
+            self.nodes[node_id] = node
+        if parent is not None:
+            self.edges.append([parent, node_id])
+
+def _add_items(graph, items, parent, add):
+    """Attach sorted ``(label, payload)`` items to ``parent`` with ``add``,
+    splitting them into ranges of at most GRAPH_FANOUT nodes."""
+    if len(items) <= GRAPH_FANOUT:
+        for item in items:
+            add(graph, item, parent)
+        return
+    size = -(-len(items) // GRAPH_FANOUT)
+    for i in range(0, len(items), size):
+        part = items[i:i + size]
+        if len(part) == 1:
+            add(graph, part[0], parent)
+            continue
+        count = sum(len(payload) if isinstance(payload, list) else 1 for _, payload in part)
+        range_id = f"range:{parent}:{i}"
+        graph.add(range_id, f"{part[0][0]} .. {part[-1][0]} ({count})", "cluster", parent, count)
+        _add_items(graph, part, range_id, add)
+
+def _add_names(graph, names, parent, zone):
+    """Attach subdomains of ``zone``, grouping them by their next label."""
+    suffix = "." + zone
+    zones = {}
+    leaves = []
+    for name in names:
+        relative = name[:-len(suffix)] if name.endswith(suffix) else ""
+        if "." in relative:
+            zones.setdefault(relative.rsplit(".", 1)[1], []).append(name)
+        else:
+            leaves.append(name)
+    items = []
+    for name in leaves:
+        relative = name[:-len(suffix)] if name.endswith(suffix) else ""
+        if relative in zones:
+            # A name that is also a zone (api.x next to a.api.x) goes inside it
+            zones[relative].append(name)
+        else:
+            items.append((name, None))
+    for label, members in zones.items():
+        if len(members) == 1:
+            items.append((members[0], None))
+        else:
+            items.append((f"{label}.{zone}", members))
+    _add_items(graph, sorted(items, key=lambda item: item[0]), parent, _add_name)
+
+def _add_name(graph, item, parent):
+    name, members = item
+    if members is None:
+        graph.add(name, name, "subdomain", parent)
+        return
+    zone_id = f"zone:{parent}:{name}"
+    graph.add(zone_id, f"*.{name} ({len(members)})", "cluster", parent, len(members))
+    _add_names(graph, members, zone_id, name)
+
+def _host_adder(zone):
+    def add(graph, item, parent):
+        ip, host = item
+        graph.add(ip, f"{ip}\n[{host.get('country', '')}] {host.get('isp', '')}", "host", parent)
+        _add_names(graph, host["names"], ip, zone)
+    return add
+
+def build_graph(data):
     """
-    Generates an HTML network graph from scan data.
+    Nodes and ``[from, to]`` edges of the network map, styled by ``groups``
+    for vis-network.
     """
-    net = Network(height="600px", width="100%", bgcolor="#0a0a0a", font_color="white")
-    
+    graph = _Graph()
+    domain = data["domain"]
+
     # Root Node
-    net.add_node(data["domain"], label=data["domain"], color="#00ff41", shape="star", size=30)
-    
+    graph.add(domain, domain, "domain")
+
     # IP Node & Geo
     if data.get("ip"):
         ip_label = f"{data['ip']}"
@@ -147,50 +420,69 @@ def generate_network_map(data):
             country = data["geoip"].get("countryCode", "")
             isp = data["geoip"].get("isp", "")
             ip_label += f"\n[{country}] {isp}"
-            
-        net.add_node(data["ip"], label=ip_label, color="#ffcc00", shape="diamond")
-        net.add_edge(data["domain"], data["ip"])
-        
+        graph.add(data["ip"], ip_label, "host", domain)
+
         # Ports
         for p in data.get("ports", []):
             label = f"{p['service']}:{p['port']}"
-            net.add_node(label, label=label, color="#ff0000", shape="dot", size=10)
-            net.add_edge(data["ip"], label)
-            
+            graph.add(label, label, "port", data["ip"])
+
     # DNS Nodes (MX, NS)
     dns_data = data.get("dns", {})
-    
     for mx in dns_data.get("MX", []):
-        label = f"MX: {mx}"
-        net.add_node(label, label=label, color="#00ccff", shape="triangle")
-        net.add_edge(data["domain"], label)
-
+        graph.add(f"MX: {mx}", f"MX: {mx}", "mx", domain)
     for ns in dns_data.get("NS", []):
-        label = f"NS: {ns}"
-        net.add_node(label, label=label, color="#ff00ff", shape="triangle")
-        net.add_edge(data["domain"], label)
-            
-    # Subdomains (Cluster them if too many)
-    subs = data.get("subdomains", [])
-    if len(subs) > 20: 
-        # Create a cluster node
-        cluster_label = f"+{len(subs)} SUBDOMAINS"
-        net.add_node("subs_cluster", label=cluster_label, color="#00cc00", shape="hexagon", size=20)
-        net.add_edge(data["domain"], "subs_cluster")
-        # Connect first 5 explicitly
-        for sub in subs[:5]:
-            net.add_node(sub, label=sub, color="#00cc00", shape="dot", size=15)
-            net.add_edge("subs_cluster", sub)
+        graph.add(f"NS: {ns}", f"NS: {ns}", "ns", domain)
+
+    # Subdomains, grouped by the AS and IP they resolve to
+    hosts = data.get("hosts", [])
+    if hosts:
+        by_asn = {}
+        for host in hosts:
+            by_asn.setdefault(host.get("asn") or "UNKNOWN AS", []).append((host["ip"], host))
+        for asn, members in sorted(by_asn.items()):
+            graph.add(f"as:{asn}", asn, "asn", domain)
+            _add_items(graph, sorted(members, key=lambda m: m[0]), f"as:{asn}", _host_adder(domain))
+
+        unresolved = data.get("subdomain_stats", {}).get("unresolved", 0)
+        if unresolved:
+            graph.add("unresolved", f"{unresolved} UNRESOLVED", "unresolved", domain)
     else:
-        for sub in subs:
-            net.add_node(sub, label=sub, color="#00cc00", shape="dot", size=15)
-            net.add_edge(data["domain"], sub)
-        
+        _add_names(graph, data.get("subdomains", []), domain, domain)
+
+    return {"groups": GRAPH_GROUPS, "nodes": list(graph.nodes.values()), "edges": graph.edges}
+
+# Rendered maps by hash of the scan data
+_map_cache = OrderedDict()
+_map_lock = threading.Lock()
+MAP_CACHE_SIZE = 32
+
+def generate_network_map(data):
+    """
+    Generates an HTML network graph from scan data.
+    """
+    key = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    with _map_lock:
+        if key in _map_cache:
+            _map_cache.move_to_end(key)
+            return _map_cache[key]
+
+    net = Network(height="600px", width="100%", bgcolor="#0a0a0a", font_color="white")
+    graph = build_graph(data)
+    for node in graph["nodes"]:
+        net.add_node(node["id"], label=node.get("label", node["id"]), **GRAPH_GROUPS[node["group"]])
+    for source, target in graph["edges"]:
+        net.add_edge(source, target)
+
     # Physics options
     net.force_atlas_2based()
-    
+
     try:
-        return net.generate_html()
+        html = net.generate_html()
     except:
         return "Error generating graph"
-
+    with _map_lock:
+        _map_cache[key] = html
+        while len(_map_cache) > MAP_CACHE_SIZE:
+            _map_cache.popitem(last=False)
+    return html
@@ -1,12 +1,18 @@
 import ssl
-import socket
+import asyncio
 import datetime
 
-def get_ssl_info(domain: str):
+from the_big_brother.modules.cache import cached
+
+# Loading the CA bundle is slow file I/O: do it once, not per request
+SSL_CONTEXT = ssl.create_default_context()
+
+@cached("ssl_sentinel.certificate", ttl=3600)
+async def get_ssl_info(domain: str):
     """
     Connects to a domain and retrieves SSL certificate details.
     """
-    ctx = ssl.create_default_context()
+    ctx = SSL_CONTEXT
     results = {
         "domain": domain,
         "issuer": {},
@@ -19,39 +25,48 @@ def get_ssl_info(domain: str):
     }
     
     try:
-        with socket.create_connection((domain, 443), timeout=10) as sock:
-            with ctx.wrap_socket(sock, server_hostname=domain) as ssock:
-                cert = ssock.getpeercert()
-                
-                # Extract Issuer
-                for item in cert.get('issuer', []):
-                    key, val = item[0]
-                    results['issuer'][key] = val
-                    
-                # Extract Subject
-                for item in cert.get('subject', []):
-                    key, val = item[0]
-                    results['subject'][key] = val
-                
-                # Extract SANs (Subject Alternative Names)
-                # These are gold mines for subdomains
-                sans = cert.get('subjectAltName', [])
-                results['sans'] = [val for key, val in sans if key == 'DNS']
-                
-                # Dates
-                results['not_before'] = cert.get('notBefore', '')
-                results['not_after'] = cert.get('notAfter', '')
+        # Handshake on the event loop instead of a blocking socket
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(domain, 443, ssl=ctx, server_hostname=domain), timeout=10
+        )
+        try:
+            cert = writer.get_extra_info("peercert")
+            
+            # Extract Issuer
+            for item in cert.get('issuer', []):
+                key, val = item[0]
+                results['issuer'][key] = val
                 
-                # Check Expiry
-                if results['not_after']:
-                    # Format: May 25 12:00:00 2026 GMT
-                    # Python ssl usually returns this format
-                    try:
-                        expire_date = datetime.datetime.strptime(results['not_after'], "%b %d %H:%M:%S %Y %Z")
-                        if expire_date < datetime.datetime.utcnow():
-                            results['expired'] = True
-                    except:
-                        pass
+            # Extract Subject
+            for item in cert.get('subject', []):
+                key, val = item[0]
+                results['subject'][key] = val
+            
+            # Extract SANs (Subject Alternative Names)
+            # These are gold mines for subdomains
+            sans = cert.get('subjectAltName', [])
+            results['sans'] = [val for key, val in sans if key == 'DNS']
+            
+            # Dates
+            results['not_before'] = cert.get('notBefore', '')
+            results['not_after'] = cert.get('notAfter', '')
+            
+            # Check Expiry
+            if results['not_after']:
+                # Format: May 25 12:00:00 2026 GMT
+                # Python ssl usually returns this format
+                try:
+                    expire_date = datetime.datetime.strptime(results['not_after'], "%b %d %H:%M:%S %Y %Z")
+                    if expire_date < datetime.datetime.utcnow():
+                        results['expired'] = True
+                except:
+                    pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
                         
     except Exception as e:
         results['error'] = str(e)
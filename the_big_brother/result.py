@@ -33,7 +33,8 @@ class QueryResult():
     Describes result of query about a given username.
     """
     def __init__(self, username, site_name, site_url_user, status,
-                 query_time=None, context=None):
+                 query_time=None, context=None, http_status=None,
+                 final_url=None, response_text=None):
         """Create Query Result Object.
 
         Contains information about a specific method of detecting usernames on
@@ -57,6 +58,15 @@ class QueryResult():
                                   an error, this might indicate the type of
                                   error that occurred.
                                   Default of None.
+        http_status            -- HTTP status code of the probe response.
+                                  Default of None.
+        final_url              -- URL the probe response came from, after
+                                  any redirects.
+                                  Default of None.
+        response_text          -- Body of the probe response. Only kept for
+                                  claimed results whose probe was the
+                                  profile page itself.
+                                  Default of None.
 
         Return Value:
         Nothing.
@@ -68,6 +78,9 @@ class QueryResult():
         self.status        = status
         self.query_time    = query_time
         self.context       = context
+        self.http_status   = http_status
+        self.final_url     = final_url
+        self.response_text = response_text
 
         return
 
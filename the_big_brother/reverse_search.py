@@ -1,21 +1,80 @@
-from playwright.async_api import async_playwright
+from the_big_brother.browser_pool import get_browser_pool
 import urllib.parse
 import asyncio
-import random
+
+# Result extractors, one per engine. They double as readiness checks: a page
+# is ready as soon as its extractor finds something.
+GOOGLE_JS = """() => {
+    const imgs = Array.from(document.querySelectorAll('img'));
+    return imgs
+        .map(img => img.src || img.getAttribute('data-src'))
+        .filter(src => src && src.startsWith('http') && src.length > 80 && !src.includes('gstatic') && !src.includes('google'))
+        .slice(0, 5);
+}"""
+
+BING_JS = """() => {
+    const imgs = Array.from(document.querySelectorAll('img'));
+    return imgs
+        .map(img => img.src || img.getAttribute('data-src'))
+        .filter(src => src && src.startsWith('http') && src.length > 50 && !src.includes('bing.com'))
+        .slice(0, 5);
+}"""
+
+YANDEX_JS = """() => {
+    const imgs = Array.from(document.querySelectorAll('.serp-item__thumb, img.serp-item__img, .CbirSites-ItemThumb'));
+    return imgs
+            .map(img => img.src || img.getAttribute('data-src'))
+            .filter(src => src && src.startsWith('http') && src.length > 50)
+            .slice(0, 5);
+}"""
+
+TINEYE_JS = """() => {
+     // TinEye results are usually in .match div with .match-thumb img
+    const imgs = Array.from(document.querySelectorAll('.match-thumb img, .result-match img'));
+    return imgs
+        .map(img => img.src)
+        .filter(src => src && src.startsWith('http'))
+        .slice(0, 5);
+}"""
+
+# Longest we wait for results to render after navigation (was a fixed
+# random sleep of up to this long).
+SETTLE_TIMEOUT = {"google": 4.0, "bing": 3.5, "yandex": 5.0, "tineye": 4.0}
+
+USER_AGENTS = {
+    "google": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "bing": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
+    "yandex": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "tineye": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+
+async def wait_for_results(page, extract_js: str, timeout: float):
+    """Wait until ``extract_js`` finds results or the network goes idle,
+    whichever comes first, for at most ``timeout`` seconds."""
+    waits = [
+        asyncio.ensure_future(page.wait_for_function(f"() => ({extract_js})().length > 0",
+                                                     polling=250, timeout=timeout * 1000)),
+        asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=timeout * 1000)),
+    ]
+    try:
+        await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for wait in waits:
+            wait.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)
 
 class ReverseImageSearcher:
     def __init__(self, headless=True):
         self.headless = headless
 
-    async def _search_google(self, context, encoded_url):
+    async def _search_google(self, page, encoded_url):
         results = []
         try:
             print("   [+] Scanning Google Images... (Async)")
-            page = await context.new_page()
             # Using Google Images instead of Lens, with SafeSearch OFF
             url = f"https://www.google.com/searchbyimage?image_url={encoded_url}&safe=off"
             await page.goto(url, timeout=30000)
-            
+
             # CONSENT HANDLING
             try:
                 # Try generic "Reject all" or "Accept all" buttons which cover most EU/US cases
@@ -25,131 +84,123 @@ class ReverseImageSearcher:
                      await page.get_by_role("button", name="Accept all").click()
             except: pass
 
-            await asyncio.sleep(random.uniform(2.5, 4.0))
+            await wait_for_results(page, GOOGLE_JS, SETTLE_TIMEOUT["google"])
 
-            results = await page.evaluate("""() => {
-                const imgs = Array.from(document.querySelectorAll('img'));
-                return imgs
-                    .map(img => img.src || img.getAttribute('data-src'))
-                    .filter(src => src && src.startsWith('http') && src.length > 80 && !src.includes('gstatic') && !src.includes('google')) 
-                    .slice(0, 5);
-            }""")
+            results = await page.evaluate(GOOGLE_JS)
             print(f"   [+] Google: Found {len(results)} matches.")
-            await page.close()
         except Exception as e:
             print(f"   [-] Google Error: {e}")
         return results
 
-    async def _search_bing(self, context, encoded_url):
+    async def _search_bing(self, page, encoded_url):
         results = []
         try:
             print("   [+] Scanning Bing Visual... (Async)")
-            page = await context.new_page()
             url = f"https://www.bing.com/images/search?view=detailv2&iss=sbi&form=SBIHMP&q=imgurl:{encoded_url}&adlt=off"
             await page.goto(url, timeout=30000)
-            
+
              # Cookie banner check
             try:
                 if await page.locator('#bnp_btn_reject').is_visible():
                     await page.click('#bnp_btn_reject')
             except: pass
-            
-            await asyncio.sleep(random.uniform(2.0, 3.5))
-
-            results = await page.evaluate("""() => {
-                const imgs = Array.from(document.querySelectorAll('img'));
-                return imgs
-                    .map(img => img.src || img.getAttribute('data-src'))
-                    .filter(src => src && src.startsWith('http') && src.length > 50 && !src.includes('bing.com'))
-                    .slice(0, 5);
-            }""")
+
+            await wait_for_results(page, BING_JS, SETTLE_TIMEOUT["bing"])
+
+            results = await page.evaluate(BING_JS)
             print(f"   [+] Bing: Found {len(results)} matches.")
-            await page.close()
         except Exception as e:
             print(f"   [-] Bing Error: {e}")
         return results
 
-    async def _search_yandex(self, context, encoded_url):
+    async def _search_yandex(self, page, encoded_url):
         results = []
         try:
             print("   [+] Scanning Yandex Visual... (Async)")
-            page = await context.new_page()
             url = f"https://yandex.com/images/search?rpt=imageview&url={encoded_url}"
             # Yandex needs retry logic often
             try:
                 await page.goto(url, timeout=40000)
             except:
                 await page.reload()
-            
-            await asyncio.sleep(random.uniform(3.0, 5.0))
-
-            results = await page.evaluate("""() => {
-                const imgs = Array.from(document.querySelectorAll('.serp-item__thumb, img.serp-item__img, .CbirSites-ItemThumb'));
-                return imgs
-                        .map(img => img.src || img.getAttribute('data-src'))
-                        .filter(src => src && src.startsWith('http') && src.length > 50)
-                        .slice(0, 5);
-            }""")
+
+            await wait_for_results(page, YANDEX_JS, SETTLE_TIMEOUT["yandex"])
+
+            results = await page.evaluate(YANDEX_JS)
             print(f"   [+] Yandex: Found {len(results)} matches.")
-            await page.close()
         except Exception as e:
             print(f"   [-] Yandex Error: {e}")
         return results
 
-    async def _search_tineye(self, context, encoded_url):
+    async def _search_tineye(self, page, encoded_url):
         results = []
         try:
             print("   [+] Scanning TinEye... (Async)")
-            page = await context.new_page()
             url = f"https://tineye.com/search?url={encoded_url}"
             await page.goto(url, timeout=30000)
-            
-            await asyncio.sleep(random.uniform(2.0, 4.0))
-
-            results = await page.evaluate("""() => {
-                 // TinEye results are usually in .match div with .match-thumb img
-                const imgs = Array.from(document.querySelectorAll('.match-thumb img, .result-match img'));
-                return imgs
-                    .map(img => img.src)
-                    .filter(src => src && src.startsWith('http'))
-                    .slice(0, 5);
-            }""")
+
+            await wait_for_results(page, TINEYE_JS, SETTLE_TIMEOUT["tineye"])
+
+            results = await page.evaluate(TINEYE_JS)
             print(f"   [+] TinEye: Found {len(results)} matches.")
-            await page.close()
         except Exception as e:
             print(f"   [-] TinEye Error: {e}")
         return results
 
-    async def search(self, image_url: str) -> dict:
-        results = {"google": [], "bing": [], "yandex": [], "tineye": []}
+    async def _on_lease(self, engine_name, engine, encoded_url):
+        try:
+            async with get_browser_pool().lease(f"reverse-{engine_name}", headless=self.headless,
+                                                viewport={"width":1920,"height":1080},
+                                                user_agent=USER_AGENTS[engine_name]) as lease:
+                return await engine(lease.page, encoded_url)
+        except Exception as e:
+            print(f"   [-] Browser unavailable for {engine_name}: {e}")
+            return []
+
+    async def _search_all(self, encoded_url, emit):
+        # Runs on the browser pool loop; every engine reports as soon as it is done.
+        engines = {
+            "google": self._search_google,
+            "bing": self._search_bing,
+            "yandex": self._search_yandex,
+            "tineye": self._search_tineye,
+        }
+
+        async def run(name, engine):
+            emit((name, await self._on_lease(name, engine, encoded_url)))
+
+        await asyncio.gather(*(run(name, engine) for name, engine in engines.items()))
+
+    async def search_iter(self, image_url: str):
+        """Yield ``(engine, results)`` pairs in the order the engines finish."""
         encoded_url = urllib.parse.quote(image_url)
         print(f"[*] Starting Async Quad-Vector Search for: {image_url}")
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=self.headless,
-                args=['--disable-blink-features=AutomationControlled']
-            )
-            
-            ctx_g = await browser.new_context(viewport={"width":1920,"height":1080}, user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-            ctx_b = await browser.new_context(viewport={"width":1920,"height":1080}, user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15")
-            ctx_y = await browser.new_context(viewport={"width":1920,"height":1080}, user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-            ctx_t = await browser.new_context(viewport={"width":1920,"height":1080}, user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-
-            # Run in parallel
-            g_res, b_res, y_res, t_res = await asyncio.gather(
-                self._search_google(ctx_g, encoded_url),
-                self._search_bing(ctx_b, encoded_url),
-                self._search_yandex(ctx_y, encoded_url),
-                self._search_tineye(ctx_t, encoded_url)
-            )
-            
-            results["google"] = g_res
-            results["bing"] = b_res
-            results["yandex"] = y_res
-            results["tineye"] = t_res
-            
-            await browser.close()
-            
-        print("[*] Deep Search Complete.")
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Queue()
+
+        def emit(item):
+            try:
+                loop.call_soon_threadsafe(finished.put_nowait, item)
+            except RuntimeError:
+                pass  # The consumer's loop is gone
+
+        future = get_browser_pool().submit(self._search_all, encoded_url, emit)
+        # Ends the iteration even if the search itself fails
+        future.add_done_callback(lambda _: emit(None))
+        try:
+            while True:
+                item = await finished.get()
+                if item is None:
+                    break
+                yield item
+            print("[*] Deep Search Complete.")
+        finally:
+            # Stops the remaining engines if the consumer goes away early
+            future.cancel()
+
+    async def search(self, image_url: str) -> dict:
+        results = {"google": [], "bing": [], "yandex": [], "tineye": []}
+        async for engine, matches in self.search_iter(image_url):
+            results[engine] = matches
         return results
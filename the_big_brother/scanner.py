@@ -41,6 +41,7 @@ from the_big_brother.result import QueryResult
 from the_big_brother.notify import QueryNotify
 from the_big_brother.notify import QueryNotifyPrint
 from the_big_brother.sites import SitesInformation
+from the_big_brother.validators.headless_validator import PROBE_HTML_LIMIT
 from colorama import init
 from argparse import ArgumentTypeError
 
@@ -174,6 +175,7 @@ def scan(
     dump_response: bool = False,
     proxy: Optional[str] = None,
     timeout: int = 60,
+    session: Optional[FuturesSession] = None,
 ) -> dict[str, dict[str, Union[str, QueryResult]]]:
     """Run The Big Brother Analysis.
 
@@ -189,6 +191,9 @@ def scan(
     proxy                  -- String indicating the proxy URL
     timeout                -- Time in seconds to wait before timing out request.
                               Default is 60 seconds.
+    session                -- FuturesSession to issue the requests through,
+                              e.g. one backed by a shared executor.
+                              Default of None creates a private session.
 
     Return Value:
     Dictionary containing results from report. Key of dictionary is the name
@@ -207,20 +212,21 @@ def scan(
     # Notify caller that we are starting the query.
     query_notify.start(username)
 
-    # Normal requests
-    underlying_session = requests.session()
+    if session is None:
+        # Normal requests
+        underlying_session = requests.session()
 
-    # Limit number of workers to 20.
-    # This is probably vastly overkill.
-    if len(site_data) >= 20:
-        max_workers = 20
-    else:
-        max_workers = len(site_data)
+        # Limit number of workers to 20.
+        # This is probably vastly overkill.
+        if len(site_data) >= 20:
+            max_workers = 20
+        else:
+            max_workers = len(site_data)
 
-    # Create multi-threaded session for all requests.
-    session = BigBrotherFuturesSession(
-        max_workers=max_workers, session=underlying_session
-    )
+        # Create multi-threaded session for all requests.
+        session = BigBrotherFuturesSession(
+            max_workers=max_workers, session=underlying_session
+        )
 
     # Results from analysis of all sites
     results_total = {}
@@ -312,6 +318,8 @@ def scan(
                 # The final result of the request will be what is available.
                 allow_redirects = True
 
+            results_site["url_probe"] = url_probe
+
             # This future starts running the request in a new thread, doesn't block the main thread
             if proxy is not None:
                 proxies = {"http": proxy, "https": proxy}
@@ -481,6 +489,18 @@ def scan(
             print("VERDICT       : " + str(query_status))
             print("+++++++++++++++++++++")
 
+        # Claimed hits keep the probe response when it is the profile page
+        # itself, so callers can judge them without fetching the page again.
+        # Only the part the probe check reads is kept: the results of a whole
+        # scan stay in memory until it returns.
+        probe_response = {}
+        if query_status == QueryStatus.CLAIMED and results_site.get("url_probe") == url:
+            probe_response = {
+                "http_status": r.status_code,
+                "final_url": r.url,
+                "response_text": r.text[:PROBE_HTML_LIMIT],
+            }
+
         # Notify caller about results of query.
         result: QueryResult = QueryResult(
             username=username,
@@ -489,6 +509,7 @@ def scan(
             status=query_status,
             query_time=response_time,
             context=error_context,
+            **probe_response,
         )
         query_notify.update(result)
 
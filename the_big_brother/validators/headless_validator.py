@@ -1,10 +1,49 @@
+import asyncio
+import html
+import re
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Optional
+from urllib.parse import urlparse
 
 try:
-    from playwright.sync_api import sync_playwright
+    from playwright.async_api import async_playwright
 except ImportError:
-    sync_playwright = None
+    async_playwright = None
+
+from the_big_brother.browser_pool import BrowserPool, Lease, get_browser_pool
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+
+ERROR_KEYWORDS_TITLE = ["page not found", "404", "not found", "doesn't exist", "does not exist", "user not found"]
+ERROR_KEYWORDS_BODY = ["this page isn't available", "sorry, this content isn't available right now"]
+
+# Resource types the lightweight profile lets through. Images, fonts, media
+# and stylesheets never affect the title or the text we look at.
+DEFAULT_ALLOWED_RESOURCES = ("document", "script", "xhr", "fetch")
+
+# How much page text to read: the error keywords sit near the top of the
+# page, and only the first 1000 characters are kept as the snippet.
+TEXT_LIMIT = 4000
+
+# Collect visible-ish text node by node and stop at the limit, instead of
+# materializing innerText for the whole (possibly huge) page.
+READ_TEXT_JS = """(limit) => {
+    const body = document.body;
+    if (!body) return '';
+    const skip = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE']);
+    const walker = document.createTreeWalker(body, NodeFilter.SHOW_TEXT, {
+        acceptNode: n => (n.parentElement && !skip.has(n.parentElement.tagName))
+            ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_REJECT
+    });
+    let out = '';
+    let node;
+    while (out.length < limit && (node = walker.nextNode())) {
+        const text = node.nodeValue.replace(/\\s+/g, ' ').trim();
+        if (text) out += text + '\\n';
+    }
+    return out.slice(0, limit);
+}"""
 
 @dataclass
 class LinkValidationResult:
@@ -14,78 +53,232 @@ class LinkValidationResult:
     title: Optional[str] = None
     final_url: Optional[str] = None
     visible_text: Optional[str] = None
+    bytes_transferred: Optional[int] = None
+    elapsed: Optional[float] = None
+    blocked_requests: Optional[int] = None
+    tier: Optional[str] = None
+
+def check_page(url: str, status: int, title: str, body_text: str, final_url: str) -> LinkValidationResult:
+    """Apply the profile heuristics to a loaded page."""
+    # Status check
+    if status >= 400:
+        return LinkValidationResult(url, False, reason=f"HTTP {status}", title=title, final_url=final_url)
+
+    # Heuristic 1: Title content
+    if any(k in title.lower() for k in ERROR_KEYWORDS_TITLE):
+        return LinkValidationResult(url, False, reason="Title indicated 404", title=title, final_url=final_url)
+
+    validation_text = body_text[:1000] # First 1000 chars
+
+    # Heuristic 2: Body content
+    if any(k in body_text.lower() for k in ERROR_KEYWORDS_BODY):
+        return LinkValidationResult(url, False, reason="Body content indicated 404", title=title, final_url=final_url)
+
+    return LinkValidationResult(url, True, title=title, final_url=final_url, visible_text=validation_text)
+
+# Tier 1 (probe response) tuning
+PROBE_HTML_LIMIT = 200_000
+PROBE_MIN_TEXT = 200
+LOGIN_PATH_HINTS = ("login", "signin", "sign_in", "sign-in", "register", "signup", "auth")
+JS_SHELL_HINTS = ("enable javascript", "javascript is required", "requires javascript",
+                  "you need to enable javascript", "please turn on javascript")
+
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_EMPTY_MOUNT_RE = re.compile(r"<div[^>]+id=[\"']?(root|app|__next)[\"']?[^>]*>\s*</div>", re.IGNORECASE)
+_NON_TEXT_RE = re.compile(r"<(script|style|noscript|template|title)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+def check_probe_response(url: str, status: Optional[int], final_url: Optional[str],
+                         page_html: Optional[str]) -> Optional[LinkValidationResult]:
+    """Cheap first tier: judge a hit from the probe response already in hand.
+
+    Applies the same heuristics as the browser tier to the status code,
+    final URL, <title> and static text of the response. Returns None when
+    the response can't settle it (no body, little static text, or a page
+    that needs JavaScript), in which case the browser tier has to decide.
+    """
+    if status is None:
+        return None
+    final_url = final_url or url
+
+    if status >= 400:
+        return LinkValidationResult(url, False, reason=f"HTTP {status}", final_url=final_url, tier="probe")
+
+    # Redirected away from the profile to the home or a login page
+    requested_path = urlparse(url).path.rstrip("/")
+    final_path = urlparse(final_url).path.rstrip("/")
+    if final_path != requested_path:
+        if not final_path or any(h in final_path.lower() for h in LOGIN_PATH_HINTS):
+            return LinkValidationResult(url, False, reason=f"Redirected to {final_url}", final_url=final_url, tier="probe")
+
+    if not page_html:
+        return None
+    page_html = page_html[:PROBE_HTML_LIMIT]
+
+    match = _TITLE_RE.search(page_html)
+    title = _SPACE_RE.sub(" ", html.unescape(match.group(1))).strip() if match else ""
+    if title and any(k in title.lower() for k in ERROR_KEYWORDS_TITLE):
+        return LinkValidationResult(url, False, reason="Title indicated 404", title=title, final_url=final_url, tier="probe")
+
+    text = _NON_TEXT_RE.sub(" ", page_html)
+    text = _SPACE_RE.sub(" ", html.unescape(_TAG_RE.sub(" ", text))).strip()
+    text_lower = text.lower()
+    if any(k in text_lower for k in ERROR_KEYWORDS_BODY):
+        return LinkValidationResult(url, False, reason="Body content indicated 404", title=title, final_url=final_url, tier="probe")
+
+    # Client-rendered shells say little until their scripts run
+    html_lower = page_html.lower()
+    if not title or len(text) < PROBE_MIN_TEXT or _EMPTY_MOUNT_RE.search(page_html) \
+            or any(h in html_lower for h in JS_SHELL_HINTS):
+        return None
+
+    return LinkValidationResult(url, True, title=title, final_url=final_url, visible_text=text[:1000], tier="probe")
 
 class HeadlessValidator:
-    def __init__(self, headless: bool = True):
+    """Validate single URLs from synchronous code.
+
+    Pages load in full (no resource blocking) on a context leased from the
+    shared browser pool.
+    """
+
+    def __init__(self, headless: bool = True, browser_pool: Optional[BrowserPool] = None):
         self.headless = headless
-        self.playwright = None
-        self.browser = None
-        if sync_playwright is None:
+        self.browser_pool = browser_pool or get_browser_pool()
+        self._validator = AsyncValidatorPool(size=1, headless=headless, allowed_resources=None,
+                                             browser_pool=self.browser_pool)
+        if async_playwright is None:
             print("Warning: Playwright is not installed. Headless validation will fail.")
 
     def __enter__(self):
-        if sync_playwright:
-            self.playwright = sync_playwright().start()
-            self.browser = self.playwright.chromium.launch(headless=self.headless)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.browser:
-            self.browser.close()
-        if self.playwright:
-            self.playwright.stop()
+        pass
 
     def validate(self, url: str) -> LinkValidationResult:
-        if not self.browser:
-            if not sync_playwright:
-                 return LinkValidationResult(url, False, reason="Playwright not installed")
-            # If used without context manager, launch for single use (slower)
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=self.headless)
-                return self._validate_with_browser(browser, url)
-        
-        return self._validate_with_browser(self.browser, url)
-
-    def _validate_with_browser(self, browser, url: str) -> LinkValidationResult:
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
-        )
-        page = context.new_page()
+        if async_playwright is None:
+            return LinkValidationResult(url, False, reason="Playwright not installed")
         try:
-            # Navigate
-            response = page.goto(url, timeout=30000, wait_until="domcontentloaded")
-            
-            if not response:
-                page.close()
-                return LinkValidationResult(url, False, reason="No response")
-
-            final_url = page.url
-            title = page.title()
-            
-            # Status check
-            if response.status >= 400:
-                page.close()
-                return LinkValidationResult(url, False, reason=f"HTTP {response.status}", title=title, final_url=final_url)
-
-            # Heuristic 1: Title content
-            error_keywords_title = ["page not found", "404", "not found", "doesn't exist", "does not exist", "user not found"]
-            if any(k in title.lower() for k in error_keywords_title):
-                page.close()
-                return LinkValidationResult(url, False, reason="Title indicated 404", title=title, final_url=final_url)
-
-            # Get text
-            body_text = page.evaluate("document.body.innerText")
-            validation_text = body_text[:1000] # First 1000 chars
-
-            # Heuristic 2: Body content
-            error_keywords_body = ["this page isn't available", "sorry, this content isn't available right now"]
-            if any(k in body_text.lower() for k in error_keywords_body):
-                 page.close()
-                 return LinkValidationResult(url, False, reason="Body content indicated 404", title=title, final_url=final_url)
-            
-            page.close()
-            return LinkValidationResult(url, True, title=title, final_url=final_url, visible_text=validation_text)
-
+            return self.browser_pool.run_sync(self._validator._validate_leased, url)
         except Exception as e:
-            page.close()
-            return LinkValidationResult(url, False, reason=f"Browsing error: {str(e)}")
+            return LinkValidationResult(url, False, reason=f"Browser unavailable: {e}")
+
+def _site_domain(host: str) -> str:
+    # Good enough for "same site" checks without a public suffix list
+    return ".".join(host.split(".")[-2:])
+
+class AsyncValidatorPool:
+    """Validate many URLs in parallel on contexts leased from the browser pool.
+
+    Up to ``size`` validations run at once, each on a context (with one
+    page) borrowed from the process-wide BrowserPool; the pool keeps the
+    contexts warm between jobs and recycles them.
+
+    Pages load in a lightweight profile: requests whose resource type is not
+    in ``allowed_resources`` are aborted, as are scripts from other sites
+    unless ``third_party_scripts`` is set. Pass ``allowed_resources=None``
+    to load everything.
+    """
+
+    def __init__(self, size: int = 8, headless: bool = True,
+                 allowed_resources: Optional[Iterable[str]] = DEFAULT_ALLOWED_RESOURCES,
+                 third_party_scripts: bool = False, browser_pool: Optional[BrowserPool] = None):
+        self.size = size
+        self.headless = headless
+        self.allowed_resources = frozenset(allowed_resources) if allowed_resources is not None else None
+        self.third_party_scripts = third_party_scripts
+        self.browser_pool = browser_pool or get_browser_pool()
+        # Contexts with different routing rules must not be shared.
+        resources = ",".join(sorted(self.allowed_resources)) if self.allowed_resources is not None else "all"
+        self._kind = f"validator:{resources}:{int(third_party_scripts)}"
+        self._slots = asyncio.Semaphore(size)
+        self._stats = {"validations": 0, "bytes": 0, "seconds": 0.0, "blocked_requests": 0}
+
+    async def __aenter__(self):
+        if async_playwright is None:
+            print("Warning: Playwright is not installed. Headless validation will fail.")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # Leased contexts are already back in the shared pool.
+        pass
+
+    async def validate(self, url: str) -> LinkValidationResult:
+        if async_playwright is None:
+            return LinkValidationResult(url, False, reason="Playwright not installed")
+
+        async with self._slots:
+            try:
+                result = await self.browser_pool.run(self._validate_leased, url)
+            except Exception as e:
+                return LinkValidationResult(url, False, reason=f"Browser unavailable: {e}")
+
+        self._stats["validations"] += 1
+        self._stats["bytes"] += result.bytes_transferred
+        self._stats["seconds"] += result.elapsed
+        self._stats["blocked_requests"] += result.blocked_requests
+        return result
+
+    async def validate_many(self, urls: list) -> list:
+        return await asyncio.gather(*(self.validate(url) for url in urls))
+
+    def stats(self) -> dict:
+        """Totals over every validation run by this pool."""
+        stats = dict(self._stats)
+        count = stats["validations"]
+        stats["avg_ms"] = round(stats.pop("seconds") * 1000 / count) if count else 0
+        return stats
+
+    async def _validate_leased(self, url: str) -> LinkValidationResult:
+        # Runs on the browser pool loop.
+        async with self.browser_pool.lease(self._kind, setup=self._setup, headless=self.headless,
+                                           user_agent=USER_AGENT) as lease:
+            lease.data["site"] = _site_domain(urlparse(url).hostname or "")
+            lease.data["blocked"] = 0
+            lease.data["finished"] = []
+            start = time.monotonic()
+            try:
+                response = await lease.page.goto(url, timeout=30000, wait_until="domcontentloaded")
+                if not response:
+                    result = LinkValidationResult(url, False, reason="No response")
+                else:
+                    final_url = lease.page.url
+                    title = await lease.page.title()
+                    body_text = await lease.page.evaluate(READ_TEXT_JS, TEXT_LIMIT)
+                    result = check_page(url, response.status, title, body_text, final_url)
+            except Exception as e:
+                result = LinkValidationResult(url, False, reason=f"Browsing error: {str(e)}")
+                lease.discard()
+
+            result.tier = "browser"
+            result.elapsed = time.monotonic() - start
+            result.blocked_requests = lease.data["blocked"]
+            result.bytes_transferred = await self._transferred(lease.data["finished"])
+            return result
+
+    @staticmethod
+    async def _transferred(requests) -> int:
+        sizes = await asyncio.gather(*(r.sizes() for r in requests), return_exceptions=True)
+        return sum(
+            size.get("responseBodySize", 0) + size.get("responseHeadersSize", 0)
+            for size in sizes if isinstance(size, dict)
+        )
+
+    async def _setup(self, lease: Lease):
+        lease.data.update(site="", blocked=0, finished=[])
+        lease.page.on("requestfinished", lambda request: lease.data["finished"].append(request))
+        if self.allowed_resources is not None:
+            await lease.context.route("**/*", lambda route: self._route(lease, route))
+
+    async def _route(self, lease: Lease, route):
+        request = route.request
+        allowed = request.resource_type in self.allowed_resources
+        if allowed and request.resource_type == "script" and not self.third_party_scripts:
+            host = urlparse(request.url).hostname or ""
+            allowed = _site_domain(host) == lease.data["site"]
+        if allowed:
+            await route.continue_()
+        else:
+            lease.data["blocked"] += 1
+            await route.abort()